@@ -0,0 +1,777 @@
+"""
+    Benchmarks for the hot paths of widgets.Mpd, widgets.Mtime and the
+    float rules of floating.py, run headless: the widgets get an asyncio
+    loop in place of qtile, their update() is replaced by a recorder
+    instead of drawing to a bar, and mpd is a fake server on localhost.
+    Needs qtile and python-mpd2 to be importable, but neither X nor a
+    real mpd.
+
+        python bench.py [--events N] [--bursts N] [--burst-size N]
+                        [--idle SECONDS] [--latency MS] [--windows N]
+                        [--names N] [--lock N] [--json]
+
+    Reports the latency from a player event in the server to the
+    widget's update() for single events and, per burst, for --bursts
+    bursts of events, p50/p99 of a refresh on the event loop, the
+    round-trips to mpd per update, the memory allocated at peak and the
+    blocks left allocated per refresh, the cost of a refresh that renders
+    nothing new, do_format() against the re.sub() it replaced, and the
+    CPU used while idle, playing, paused and stopped. --latency delays
+    every reply of the fake server, like a remote mpd over wifi.
+
+    A tick of the shared /proc sampler behind CPUGraph, Memory and
+    NetGraph is timed against the reads the stock widgets did on their
+    own.
+
+    FloatRules.should_float() is run on --windows new windows, with and
+    without its cache, next to the should_be_floating() it replaced,
+    which has to agree with it on every window. The X server is a fake
+    connection that counts the round-trips.
+
+    The launcher's ExecutableIndex is built from --names synthetic
+    commands and searched as they are typed.
+
+    With --lock N the screen capture of lock.py is timed against scrot
+    and a PNG, which needs an X server, cairo and scrot.
+"""
+import os
+import re
+import sys
+import json
+import time
+import types
+import random
+import shutil
+import asyncio
+import argparse
+import tempfile
+import subprocess
+import threading
+import tracemalloc
+import socketserver
+
+from libqtile import xcbq
+
+import floating
+import widgets
+from widgets.inotify import watcher
+from widgets.launcher import ExecutableIndex
+from widgets.procstat import ProcSampler
+from widgets.snapshot import snapshot
+
+
+def percentile(values, p):
+    values = sorted(values)
+    if not values:
+        return float('nan')
+    return values[min(int(len(values) * p / 100.0), len(values) - 1)]
+
+
+def summary(values):
+    """p50 and p99 in microseconds"""
+    return {'p50_us': percentile(values, 50) * 1e6,
+            'p99_us': percentile(values, 99) * 1e6}
+
+
+class FakeQtile(object):
+    """The parts of the qtile object the widgets use, on an asyncio loop"""
+    def __init__(self, loop):
+        self._eventloop = loop
+        self.call_soon = loop.call_soon
+        self.call_soon_threadsafe = loop.call_soon_threadsafe
+        self.call_later = loop.call_later
+
+    def run_in_executor(self, func, *args):
+        return self._eventloop.run_in_executor(None, func, *args)
+
+
+class MpdHandler(socketserver.StreamRequestHandler):
+    """
+        One client connection. Speaks enough of the protocol for the
+        widget: status, currentsong, idle, noidle and command lists;
+        everything else is acknowledged without doing anything.
+    """
+    def setup(self):
+        socketserver.StreamRequestHandler.setup(self)
+        self.idling = False
+        self.changed = set()
+
+    def send(self, text):
+        self.wfile.write(text.encode())
+
+    def send_changed(self):
+        self.send(''.join('changed: %s\n' % s for s in sorted(self.changed))
+                  + 'OK\n')
+        self.changed = set()
+
+    def respond(self, command):
+        if command == 'status':
+            items = self.server.status
+        elif command == 'currentsong':
+            items = self.server.song
+        else:
+            items = {}
+        return ''.join('%s: %s\n' % item for item in items.items())
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections.add(self)
+            self.send('OK MPD 0.19.0\n')
+        command_list = None
+        try:
+            for line in self.rfile:
+                command = line.decode().strip().partition(' ')[0]
+                reply = None
+                with server.lock:
+                    if command == 'close':
+                        break
+                    elif command == 'idle':
+                        if self.changed:
+                            self.send_changed()
+                        else:
+                            self.idling = True
+                    elif command == 'noidle':
+                        if self.idling:
+                            self.idling = False
+                            self.send('OK\n')
+                    elif command == 'command_list_ok_begin':
+                        command_list = []
+                    elif command == 'command_list_end':
+                        reply = ''.join(self.respond(c) + 'list_OK\n'
+                                        for c in command_list) + 'OK\n'
+                        command_list = None
+                    elif command_list is not None:
+                        command_list.append(command)
+                    else:
+                        reply = self.respond(command) + 'OK\n'
+                if reply is not None:
+                    # one round-trip to a remote mpd
+                    server.round_trips += 1
+                    if server.latency:
+                        time.sleep(server.latency)
+                    with server.lock:
+                        self.send(reply)
+        finally:
+            with server.lock:
+                server.connections.discard(self)
+
+
+class FakeMpd(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, latency=0):
+        socketserver.ThreadingTCPServer.__init__(self, ('127.0.0.1', 0),
+                                                 MpdHandler)
+        self.port = self.server_address[1]
+        # seconds added to every reply, like a remote mpd over wifi
+        self.latency = latency
+        self.round_trips = 0
+        self.lock = threading.Lock()
+        self.connections = set()
+        # perf_counter() at which each songid was announced
+        self.sent = {}
+        self.status = {}
+        self.song = {}
+        self.set_song(0, 'pause')
+
+    def set_song(self, songid, state='play'):
+        self.status = {
+            'volume': '80', 'repeat': '0', 'random': '0', 'single': '0',
+            'consume': '0', 'playlist': str(songid), 'playlistlength': '50',
+            'state': state, 'song': str(songid % 50), 'songid': str(songid),
+            'time': '12:240', 'elapsed': '12.345', 'bitrate': '320',
+        }
+        self.song = {
+            'file': 'artist/album/%02d.flac' % (songid % 50),
+            'Artist': 'Artist', 'Album': 'Album', 'Track': str(songid % 50),
+            'Title': 'Song number %d' % songid, 'Time': '240',
+            'Pos': str(songid % 50), 'Id': str(songid),
+        }
+
+    def event(self, songid, state='play'):
+        """Switch to another song and wake up the idling clients"""
+        with self.lock:
+            self.set_song(songid, state)
+            self.sent[songid] = time.perf_counter()
+            for connection in self.connections:
+                connection.changed.add('player')
+                if connection.idling:
+                    connection.idling = False
+                    connection.send_changed()
+
+    def burst(self, first, count, interval=0):
+        for songid in range(first, first + count):
+            self.event(songid)
+            if interval:
+                time.sleep(interval)
+
+
+class Recorder(object):
+    """
+        Replaces a widget's update(), counts the calls, calls callback
+        and wakes up wait().
+    """
+    def __init__(self, widget, callback=None):
+        self.widget = widget
+        self.callback = callback
+        self.calls = 0
+        self.waiter = None
+        widget.update = self
+
+    def __call__(self, *args):
+        self.calls += 1
+        if self.callback is not None:
+            self.callback()
+        if self.waiter is not None and not self.waiter.done():
+            self.waiter.set_result(time.perf_counter())
+
+    def wait(self, loop):
+        self.waiter = loop.create_future()
+        return self.waiter
+
+
+def measure(func, iterations):
+    times = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        func(i)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def allocations(func, iterations):
+    """Peak bytes allocated by one call and blocks left behind per call"""
+    func(0)
+    tracemalloc.start()
+    # a running sum, a list of the peaks would be retained blocks itself
+    peaks = 0
+    blocks = sys.getallocatedblocks()
+    for i in range(iterations):
+        tracemalloc.reset_peak()
+        current = tracemalloc.get_traced_memory()[0]
+        func(i)
+        peaks += tracemalloc.get_traced_memory()[1] - current
+    blocks = sys.getallocatedblocks() - blocks
+    tracemalloc.stop()
+    return {'peak_bytes': peaks / float(iterations),
+            'blocks_retained': blocks / float(iterations)}
+
+
+async def bench_mpd(loop, qtile, events, bursts, burst_size, idle, latency):
+    server = FakeMpd(latency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    widget = widgets.Mpd(host='127.0.0.1', port=server.port,
+                         fmt_playing="%s %a - %t: %e/%l")
+    latencies = []
+
+    def updated():
+        sent = server.sent.get(int(widget.status.get('songid', -1)))
+        if sent is not None:
+            latencies.append(time.perf_counter() - sent)
+    recorder = Recorder(widget, updated)
+
+    widget.qtile = qtile
+    widget.timer_setup()
+    while not widget.status:
+        await asyncio.sleep(0.01)
+    results = {}
+
+    # one event at a time, each one waits for the widget to catch up
+    del latencies[:]
+    round_trips = server.round_trips
+    for songid in range(1, events + 1):
+        waiter = recorder.wait(loop)
+        server.event(songid)
+        await waiter
+    results['event'] = summary(latencies)
+    results['event']['round_trips_per_update'] = (
+        (server.round_trips - round_trips) / float(len(latencies)))
+
+    # bursts of events as fast as the server can send them. mpd coalesces
+    # them, so the latency of a burst is from its first event until the
+    # widget shows its last song
+    burst_latencies = []
+    calls = recorder.calls
+    songid = events
+    start = time.perf_counter()
+    for i in range(bursts):
+        first = songid + 1
+        songid += burst_size
+        last = str(songid)
+        sent = time.perf_counter()
+        await loop.run_in_executor(None, server.burst, first, burst_size)
+        while widget.status.get('songid') != last:
+            await recorder.wait(loop)
+        burst_latencies.append(time.perf_counter() - sent)
+    duration = time.perf_counter() - start
+    results['burst'] = dict(summary(burst_latencies), bursts=bursts,
+                            events_per_burst=burst_size,
+                            updates_per_burst=(recorder.calls - calls) /
+                            float(bursts),
+                            events_per_s=bursts * burst_size / duration)
+
+    # the widget's side only: a song change on the event loop
+    session = widget.session
+    pairs = []
+    for i in (1, 2):
+        server.set_song(i)
+        pairs.append((server.status, server.song))
+
+    def refresh(i):
+        widget.refresh(*pairs[i % 2])
+    results['refresh'] = summary(measure(refresh, events))
+    # refresh() re-arms the progress timer and the loop does not run in
+    # between, so the cancelled TimerHandles would pile up in
+    # loop._scheduled and be counted as retained, just like the
+    # latencies the recorder appends
+    timer = types.SimpleNamespace(cancel=lambda: None)
+    widget.timeout_add = lambda seconds, method, *args: timer
+    recorder.callback = None
+    results['refresh'].update(allocations(refresh, events))
+    recorder.callback = updated
+    del widget.timeout_add
+
+    def render(i):
+        widget.render()
+    results['render_unchanged'] = summary(measure(render, events))
+
+    # formatting the current song, compiled templates against the
+    # re.sub() per update that Mpd.do_format() used to do
+    def match_check(m):
+        try:
+            return widget.formats[m.group(1)](widget)
+        except KeyError:
+            return "(nil)"
+
+    def format_resub(i):
+        re.sub("%(.)", match_check, widget.fmt_playing)
+
+    def format_compiled(i):
+        widget.do_format(widget.fmt_playing)
+    results['format_resub'] = summary(measure(format_resub, events))
+    results['format_compiled'] = summary(measure(format_compiled, events))
+
+    # no events: progress timers while playing, only the idling session
+    # otherwise
+    for state, name in (('play', 'playing'), ('pause', 'paused'),
+                        ('stop', 'stopped')):
+        songid += 1
+        server.event(songid, state)
+        await asyncio.sleep(0.1)
+        calls = recorder.calls
+        cpu, wall = time.process_time(), time.perf_counter()
+        await asyncio.sleep(idle)
+        results['idle_' + name] = {
+            'cpu_percent': 100 * (time.process_time() - cpu) /
+            (time.perf_counter() - wall),
+            'updates': recorder.calls - calls}
+
+    widget.stop = True
+    widget._cancel_progress()
+    session.unsubscribe(widget)
+    server.shutdown()
+    server.server_close()
+    return results
+
+
+async def bench_mtime(loop, qtile, events, directory):
+    path = os.path.join(directory, 'mtime')
+    open(path, 'w').close()
+    results = {}
+
+    widget = widgets.Mtime(file=path, time_threshold=3600)
+    recorder = Recorder(widget)
+    widget.qtile = qtile
+    widget.timer_setup()
+    latencies = []
+    for i in range(events):
+        waiter = recorder.wait(loop)
+        start = time.perf_counter()
+        os.utime(path, (i, 1e9 + i))
+        latencies.append(await waiter - start)
+    results['inotify'] = summary(latencies)
+    widget._cancel_threshold()
+    watcher.unsubscribe(widget.directory, widget.filename, widget._changed)
+
+    widget = widgets.Mtime(file=path, time_threshold=3600,
+                           use_inotify=False)
+    Recorder(widget)
+    widget.qtile = qtile
+
+    def tick(i):
+        widget.tick()
+    results['poll_tick'] = summary(measure(tick, events))
+    results['poll_tick'].update(allocations(tick, events))
+    return results
+
+
+def stock_proc_reads(interface):
+    """
+        What the stock CPUGraph, Memory and NetGraph read per tick: each
+        opens and parses its own file.
+    """
+    def cpu():
+        with open('/proc/stat') as file:
+            lines = file.readlines()
+            line = lines.pop(0)
+            name, user, nice, sys, idle, iowait, tail = line.split(None, 6)
+            return (int(user), int(nice), int(sys), int(idle))
+
+    def memory():
+        val = {}
+        with open('/proc/meminfo') as file:
+            for line in file:
+                key, tail = line.split(':')
+                uv = tail.split()
+                val[key] = int(uv[0]) // 1000
+        val['MemUsed'] = val['MemTotal'] - val['MemFree']
+        return val
+
+    def net():
+        path = '/sys/class/net/%s/statistics/rx_bytes' % interface
+        try:
+            with open(path) as file:
+                return int(file.read())
+        except IOError:
+            return 0
+
+    def tick(i):
+        cpu()
+        memory()
+        net()
+    return tick
+
+
+def bench_proc(ticks):
+    """One ProcSampler tick against the reads of the stock widgets"""
+    class Subscriber(object):
+        name = 'bench'
+
+        def sample(self, values):
+            pass
+
+    # the first interface that isn't loopback, like the config's wlp3s0
+    with open('/proc/net/dev') as f:
+        interfaces = [line.partition(':')[0].strip()
+                      for line in f.readlines()[2:]]
+    interface = ([i for i in interfaces if i != 'lo'] or ['lo'])[0]
+
+    # without rescheduling, so nothing piles up on an event loop
+    sampler = ProcSampler(types.SimpleNamespace(
+        call_later=lambda *args: None))
+    for source in ('cpu', 'memory', 'net'):
+        sampler.subscribe(Subscriber(), source)
+
+    def tick(i):
+        sampler.sample()
+    results = {'stock': summary(measure(stock_proc_reads(interface), ticks)),
+               'sampler': summary(measure(tick, ticks))}
+    for f in sampler.files.values():
+        f.close()
+    return results
+
+
+def bench_launcher(count, searches, directory):
+    """
+        ExecutableIndex.search() on count synthetic command names, typed
+        one, two and three characters at a time, and a refresh() of an
+        unchanged $PATH that has a missing directory in it
+    """
+    rng = random.Random(0)
+    alphabet = 'abcdefghijklmnopqrstuvwxyz-'
+    names = set()
+    while len(names) < count:
+        names.add(''.join(rng.choice(alphabet)
+                          for _ in range(rng.randint(2, 20))))
+    bin_path = os.path.join(directory, 'bin')
+    os.mkdir(bin_path)
+    for name in names:
+        os.close(os.open(os.path.join(bin_path, name),
+                         os.O_CREAT | os.O_WRONLY, 0o755))
+    index = ExecutableIndex(os.path.join(directory, 'launcher.json'),
+                            os.path.join(directory, 'launcher-usage.json'))
+    path = os.environ.get('PATH')
+    os.environ['PATH'] = '%s:%s' % (os.path.join(directory, 'missing'),
+                                    bin_path)
+    try:
+        index.refresh()
+        sorted_names = sorted(names)
+        for name in rng.sample(sorted_names, 50):
+            index.usage[name] = [rng.randint(1, 20), time.time()]
+        texts = [rng.choice(sorted_names)[:length]
+                 for length in (1, 2, 3) for _ in range(searches)]
+        results = {}
+        for length in (1, 2, 3):
+            typed = [text for text in texts if len(text) == length]
+
+            def search(i):
+                index.search(typed[i % len(typed)])
+            results['search_%d' % length] = summary(measure(search, searches))
+        saves = []
+        index.save = lambda: saves.append(None)
+
+        def refresh(i):
+            index.refresh()
+        results['refresh_unchanged'] = dict(
+            summary(measure(refresh, searches)),
+            saves_per_refresh=len(saves) / float(searches))
+    finally:
+        if path is None:
+            del os.environ['PATH']
+        else:
+            os.environ['PATH'] = path
+    return results
+
+
+# config.should_be_floating() before floating.FloatRules
+float_windows = set([
+    "x11-ssh-askpass",
+    "bubble"  # chromium
+])
+
+
+def should_be_floating(w):
+    wm_class = w.get_wm_class()
+    if wm_class is None:
+        return True
+    if isinstance(wm_class, tuple):
+        for cls in wm_class:
+            if cls.lower() in float_windows:
+                return True
+    else:
+        if wm_class.lower() in float_windows:
+            return True
+    return w.get_wm_type() == 'dialog' or bool(w.get_wm_transient_for())
+
+
+class FakeReply(object):
+    """A GetProperty reply, value is a string, a list of atoms or None"""
+    def __init__(self, value):
+        self.value_len = len(value) if value else 0
+        self.value = self
+        self.data = value
+
+    def to_string(self):
+        return self.data
+
+    def to_atoms(self):
+        return self.data
+
+
+class FakeCookie(object):
+    def __init__(self, core, sequence, value):
+        self.core = core
+        self.sequence = sequence
+        self.value = value
+
+    def reply(self):
+        core = self.core
+        if self.sequence > core.received:
+            # waiting flushes every request so far, their replies come back
+            # together
+            core.round_trips += 1
+            core.received = core.sent
+        return FakeReply(self.value)
+
+
+class FakeAtoms(dict):
+    """Atoms are their names"""
+    def __missing__(self, name):
+        return name
+
+    def get_name(self, atom):
+        return atom
+
+
+class FakeConnection(object):
+    """
+        Answers GetProperty from the properties of fake windows, like
+        xcbq.Connection and its xcffib core, and counts the round-trips
+        to the X server.
+    """
+    def __init__(self):
+        self.conn = self
+        self.core = self
+        self.atoms = FakeAtoms()
+        self.properties = {}
+        self.sent = self.received = self.round_trips = 0
+
+    def GetProperty(self, delete, wid, atom, type, offset, length):
+        self.sent += 1
+        return FakeCookie(self, self.sent, self.properties[wid].get(atom))
+
+
+class FakeWindow(object):
+    """
+        A window for floating.fetch_properties() with the getters of
+        xcbq.Window that the old should_be_floating() used, each of which
+        waits for its reply.
+    """
+    def __init__(self, conn, wid, wm_class, wm_type, transient_for):
+        self.conn = conn
+        self.wid = wid
+        atoms = dict((v, k) for k, v in xcbq.WindowTypes.items())
+        conn.properties[wid] = {
+            'WM_CLASS': '\0'.join(wm_class) + '\0' if wm_class else None,
+            '_NET_WM_WINDOW_TYPE':
+                [atoms.get(wm_type, wm_type)] if wm_type else None,
+            'WM_WINDOW_ROLE': None,
+            'WM_TRANSIENT_FOR': [transient_for] if transient_for else None,
+        }
+
+    def get_property(self, name):
+        return self.conn.GetProperty(False, self.wid, name, None, 0,
+                                     2 ** 32 - 1).reply()
+
+    def get_wm_class(self):
+        r = self.get_property('WM_CLASS')
+        if r.value_len:
+            return tuple(r.value.to_string().strip('\0').split('\0'))
+        return tuple()
+
+    def get_wm_type(self):
+        r = self.get_property('_NET_WM_WINDOW_TYPE')
+        if r.value_len:
+            name = self.conn.atoms.get_name(r.value.to_atoms()[0])
+            return xcbq.WindowTypes.get(name, name)
+
+    def get_wm_transient_for(self):
+        r = self.get_property('WM_TRANSIENT_FOR')
+        if r.value_len:
+            return r.value.to_atoms()[0]
+
+
+def bench_float(count):
+    classes = [('chromium', 'Chromium-browser'), ('bubble', 'Chromium'),
+               ('x11-ssh-askpass', 'X11-ssh-askpass'), ('urxvt', 'URxvt'),
+               ('gimp', 'Gimp'), ('evince', 'Evince'), ('Navigator', 'Firefox'),
+               ()]
+    types = [None, 'normal', 'dialog', 'utility', 'splash']
+    rng = random.Random(0)
+    conn = FakeConnection()
+    windows = [FakeWindow(conn, wid, rng.choice(classes), rng.choice(types),
+                          rng.choice([None] * 9 + [0x400001]))
+               for wid in range(count)]
+
+    def rules(max_cache=1024):
+        # the rules of config.py
+        return floating.FloatRules(wm_class=float_windows,
+                                   wm_type=['dialog'], transient=True,
+                                   max_cache=max_cache)
+
+    def should_float(rules):
+        def run(i):
+            return rules.should_float(windows[i])
+        return run
+
+    cached = should_float(rules())
+    disagree = sum(should_be_floating(w) != cached(i)
+                   for i, w in enumerate(windows))
+    if disagree:
+        raise AssertionError('FloatRules disagrees with should_be_floating() '
+                             'on %d of %d windows' % (disagree, count))
+
+    results = {}
+    for name, func in (('old', lambda i: should_be_floating(windows[i])),
+                       ('should_float', cached),
+                       ('should_float_uncached', should_float(rules(0)))):
+        round_trips = conn.round_trips
+        results[name] = summary(measure(func, count))
+        results[name]['round_trips_per_window'] = (
+            (conn.round_trips - round_trips) / float(count))
+    return results
+
+
+def bench_lock(iterations, directory):
+    """
+        The capture for lock.lock_screen() against the scrot pipeline it
+        replaced, on the X server in $DISPLAY. The locker is not started:
+        the old pipeline is scrot writing a PNG and the locker decoding
+        it, the new one grab_root(), pixelate() and the memfd write.
+    """
+    # needs X and cairo, which the other benchmarks don't
+    import cairocffi
+    import lock
+
+    if shutil.which('scrot') is None:
+        raise SystemExit('--lock needs scrot for the comparison')
+    qtile = types.SimpleNamespace(
+        conn=xcbq.Connection(os.environ.get('DISPLAY', ':0')))
+    path = os.path.join(directory, 's.png')
+
+    def scrot(i):
+        subprocess.check_call(['scrot', path])
+        cairocffi.ImageSurface.create_from_png(path).flush()
+        os.unlink(path)
+
+    def capture(i):
+        width, height, pixels = lock.grab_root(qtile)
+        lock.pixelate(width, height, pixels)
+        fd = os.memfd_create('lockscreen')
+        try:
+            os.write(fd, pixels)
+        finally:
+            os.close(fd)
+    results = {'scrot_png': summary(measure(scrot, iterations)),
+               'capture': summary(measure(capture, iterations))}
+    qtile.conn.finalize()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--events', type=int, default=1000,
+                        help='events per benchmark')
+    parser.add_argument('--bursts', type=int, default=100,
+                        help='bursts of events to measure')
+    parser.add_argument('--burst-size', type=int, default=20,
+                        help='events per burst')
+    parser.add_argument('--idle', type=float, default=5,
+                        help='seconds to measure idle cpu per player state')
+    parser.add_argument('--latency', type=float, default=0,
+                        help='milliseconds the fake mpd waits per reply')
+    parser.add_argument('--windows', type=int, default=10000,
+                        help='new windows to classify as floating or not')
+    parser.add_argument('--names', type=int, default=30000,
+                        help='commands in the launcher index to search')
+    parser.add_argument('--lock', type=int, default=0, metavar='N',
+                        help='capture the screen N times for the lock '
+                             'screen, needs X and scrot')
+    parser.add_argument('--json', action='store_true',
+                        help='print the results as json')
+    args = parser.parse_args()
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    qtile = FakeQtile(loop)
+    with tempfile.TemporaryDirectory() as directory:
+        # don't touch the snapshot of a running qtile
+        snapshot.path = os.path.join(directory, 'snapshot.json')
+        results = {
+            'mpd': loop.run_until_complete(
+                bench_mpd(loop, qtile, args.events, args.bursts,
+                          args.burst_size, args.idle, args.latency / 1000.0)),
+            'mtime': loop.run_until_complete(
+                bench_mtime(loop, qtile, args.events, directory)),
+            'float': bench_float(args.windows),
+            'proc': bench_proc(args.events),
+            'launcher': bench_launcher(args.names, args.events, directory),
+        }
+        if args.lock:
+            results['lock'] = bench_lock(args.lock, directory)
+    loop.close()
+
+    if args.json:
+        json.dump(results, sys.stdout, indent=2, sort_keys=True)
+        print()
+        return
+    for widget, benchmarks in sorted(results.items()):
+        for name, values in sorted(benchmarks.items()):
+            print('%-30s %s' % ('%s %s:' % (widget, name), ', '.join(
+                '%s %.6g' % item for item in sorted(values.items()))))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,13 @@
-from libqtile.config import Key, Screen, Drag, Click, Match
+from libqtile.config import Key, Screen, Drag, Click
 import libqtile.config
 from libqtile.command import lazy
 from libqtile import layout, bar, hook
 import libqtile.widget
 from libqtile.dgroups import simple_key_binder
 
+import floating
+import lock
+import routing
 import widgets
 
 mod = "mod4"
@@ -60,21 +63,25 @@ keys = [
     Key([mod], "w", lazy.window.kill()),
     Key([mod, "control"], "r", lazy.restart()),
     Key([mod, "control"], "q", lazy.shutdown()),
-    Key([mod], "r", lazy.spawncmd()),
+    # completes from an index of $PATH ranked by use, see widgets/launcher.py
+    Key([mod], "r", lazy.function(widgets.call('launcher.launch'))),
+    # volume and brightness are changed in-process, see widgets/volume.py
+    # and widgets/backlight.py
     Key([],
         "XF86AudioRaiseVolume",
-        lazy.spawn("amixer -q -D pulse set Master 5%+ unmute")),
+        lazy.function(widgets.call('volume.mixer.raise_volume'))),
     Key([],
         "XF86AudioLowerVolume",
-        lazy.spawn("amixer -q -D pulse set Master 5%- unmute")),
+        lazy.function(widgets.call('volume.mixer.lower_volume'))),
     Key([],
         "XF86AudioMute",
-        lazy.spawn("amixer -q -D pulse set Master toggle")),
-    Key([], "XF86MonBrightnessUp", lazy.spawn("xbacklight -inc 10")),
-    Key([], "XF86MonBrightnessDown", lazy.spawn("xbacklight -dec 10")),
+        lazy.function(widgets.call('volume.mixer.toggle_mute'))),
+    Key([], "XF86MonBrightnessUp",
+        lazy.function(widgets.call('backlight.backlight.increase'))),
+    Key([], "XF86MonBrightnessDown",
+        lazy.function(widgets.call('backlight.backlight.decrease'))),
     Key(["shift"], "space", lazy.spawn("mpc toggle")),
-    Key([mod], "l", lazy.spawn("sh -c 'scrot /tmp/s.png;"
-                               "i3lock-spy -i /tmp/s.png'"))
+    Key([mod], "l", lazy.function(lock.lock_screen))
 ]
 
 
@@ -86,6 +93,9 @@ class Group(libqtile.config.Group):
         super(Group, self).__init__(name, *args, **kwargs)
         self.key = key
 
+# window classes and roles are indexed once, see routing.GroupRouter
+router = routing.GroupRouter()
+
 groups = [
         Group(
             '1:web', 1,
@@ -94,8 +104,10 @@ groups = [
             exclusive=True,
             position=1,
             matches=[
-                Match(wm_class=['Chromium-browser', 'Minefield', 'Firefox'],
-                      role=['browser'])
+                router.match('1:web',
+                             wm_class=['Chromium-browser', 'Minefield',
+                                       'Firefox'],
+                             role=['browser'])
             ]),
         Group(
             '2:dev', 2,
@@ -104,7 +116,7 @@ groups = [
             position=2,
             exclusive=True,
             matches=[
-                Match(wm_class=['URxvt', 'terminology'])
+                router.match('2:dev', wm_class=['URxvt', 'terminology'])
             ]),
         Group(
             '3:im', 3,
@@ -112,37 +124,43 @@ groups = [
             persist=False,
             position=3,
             exclusive=True,
-            matches=[Match(wm_class=['Skype', 'Gajim'])]),
+            matches=[router.match('3:im', wm_class=['Skype', 'Gajim'])]),
         Group(
             '4:mail', 4,
             init=False,
             persist=False,
             position=4,
             exclusive=True,
-            matches=[Match(wm_class=['Claws-mail', 'Thunderbird'])]),
+            matches=[
+                router.match('4:mail', wm_class=['Claws-mail', 'Thunderbird'])
+            ]),
         Group(
             '5:doc', 5,
             init=False,
             persist=False,
             position=5,
             matches=[
-                Match(wm_class=["Evince", "GVim", "Keepassx", "libreoffice"])
+                router.match('5:doc', wm_class=["Evince", "GVim", "Keepassx",
+                                                "libreoffice"])
             ]),
         Group(
             'g:pod', 'g',
             init=False,
             persist=False,
-            matches=[Match(wm_class=["Gpodder"])]),
+            matches=[router.match('g:pod', wm_class=["Gpodder"])]),
         Group(
             'v:ideo', 'v',
             init=False,
             persist=False,
-            matches=[Match(wm_class=["MPlayer", "VLC", "Smplayer", "mpv"])]),
+            matches=[
+                router.match('v:ideo',
+                             wm_class=["MPlayer", "VLC", "Smplayer", "mpv"])
+            ]),
         Group(
             'p:manfm', 'p',
             init=False,
             persist=False,
-            matches=[Match(wm_class=["Pcmanfm"])]),
+            matches=[router.match('p:manfm', wm_class=["Pcmanfm"])]),
 ]
 
 for i in groups:
@@ -186,23 +204,31 @@ battery1.update({'battery_name': 'BAT0'})
 battery2 = battery_default.copy()
 battery2.update({'battery_name': 'BAT1'})
 
-battery1_widget = libqtile.widget.Battery(**battery1)
-battery1_icon = libqtile.widget.BatteryIcon(**battery1)
-battery2_widget = libqtile.widget.Battery(**battery2)
-battery2_icon = libqtile.widget.BatteryIcon(**battery2)
+# widgets.defer() imports and creates a widget only when its bar is
+# configured and logs how long each one took, see widgets/factory.py
+
+# all four share one sampler that reads both batteries per update_delay
+# qtile only finalizes widgets with unique names
+battery1_widget = widgets.defer('Battery', name='battery0', **battery1)
+battery1_icon = widgets.defer('BatteryIcon', name='batteryicon0', **battery1)
+battery2_widget = widgets.defer('Battery', name='battery1', **battery2)
+battery2_icon = widgets.defer('BatteryIcon', name='batteryicon1', **battery2)
 
-mpd_widget = widgets.Mpd(fmt_playing="%s %a - %t: %e/%l",
-                         do_color_pause=True)
+mpd_widget = widgets.defer('Mpd', fmt_playing="%s %a - %t: %e/%l",
+                           do_color_pause=True)
 
 clock_widget = libqtile.widget.Clock(format='%Y-%m-%d %a %H:%M %p')
-cpu_graph = libqtile.widget.CPUGraph(
+# the graphs and memory_widget share one /proc sampler
+cpu_graph = widgets.defer(
+        'CPUGraph',
         samples=50,
         line_width=1,
         width=50,
         graph_color='FF2020',
         fill_color='C01010')
-memory_widget = libqtile.widget.Memory()
-net_graph = libqtile.widget.NetGraph(
+memory_widget = widgets.defer('Memory')
+net_graph = widgets.defer(
+        'NetGraph',
         samples=50,
         line_width=1,
         width=50,
@@ -216,7 +242,7 @@ def seperator():
 
 top_widgets = [
     libqtile.widget.GroupBox(),
-    libqtile.widget.Prompt(),
+    widgets.defer('Launcher', name='prompt'),
     libqtile.widget.TaskList(),
     battery1_icon,
     battery1_widget,
@@ -227,7 +253,7 @@ top_widgets = [
     libqtile.widget.Wlan(interface="wlp3s0"),
     seperator(),
     clock_widget,
-    # widget.Volume(update_interval=2, emoji=True),
+    widgets.defer('Volume'),
     libqtile.widget.Systray(),
     libqtile.widget.CurrentLayout(),
 ]
@@ -242,14 +268,20 @@ bottom_widgets = [
     mpd_widget,
     libqtile.widget.Spacer(),
     libqtile.widget.Notify(),
-    libqtile.widget.CheckUpdates(distro="Arch_checkupdates",
-                                 update_interval=7200),
-    widgets.Mtime(file="/var/lib/last-backup",
+    # checks again after pacman ran, see widgets/checkupdates.py
+    widgets.defer('CheckUpdates', update_interval=7200),
+    widgets.defer('Mtime', name='backup', file="/var/lib/last-backup",
                   text_older_threshold="Backup!"),
-    widgets.Mtime(file="/var/lib/last-nas-backup",
+    widgets.defer('Mtime', name='nas_backup',
+                  file="/var/lib/last-nas-backup",
                   time_threshold=12 * 60 * 60 * 4,
                   text_older_threshold="Backup NAS!"),
 ]
+# time poll, update and draw of every widget and warn when one blocks the
+# event loop: qtile cmd-obj -o widget <name> -f profile
+for w in top_widgets + bottom_widgets:
+    widgets.watch(w)
+
 screens = [
     Screen(
         top=bar.Bar(top_widgets, 30),
@@ -258,29 +290,62 @@ screens = [
 ]
 
 
+# seconds to collect client_managed events before focusing, 0 means the
+# rest of the current event loop iteration
+focus_delay = 0.005
+
+
+class FocusDebouncer(object):
+    """
+    Focus only the last window of a burst of client_managed events, so a
+    restored session or a browser opening many windows causes one group
+    switch and one bar redraw. stats counts bursts and windows.
+    """
+    def __init__(self, delay):
+        self.delay = delay
+        self.window = None
+        self.pending = 0
+        self.stats = dict(bursts=0, windows=0, largest_burst=0)
+
+    def __call__(self, window):
+        self.window = window
+        self.pending += 1
+        if self.pending == 1:
+            window.qtile.call_later(self.delay, self.flush)
+
+    def flush(self):
+        window, self.window = self.window, None
+        self.stats['bursts'] += 1
+        self.stats['windows'] += self.pending
+        self.stats['largest_burst'] = max(self.stats['largest_burst'],
+                                          self.pending)
+        self.pending = 0
+        # the window may have been closed while we waited
+        if window.group is None or \
+                window.window.wid not in window.qtile.windowMap:
+            return
+        window.qtile.currentScreen.setGroup(window.group)
+        window.group.focus(window, False)
+
+focus_debouncer = FocusDebouncer(focus_delay)
+
+
 @hook.subscribe.client_managed
 def focus_client(window):
-    window.qtile.currentScreen.setGroup(window.group)
-    window.group.focus(window, False)
-
-float_windows = set([
-    "x11-ssh-askpass",
-    "bubble"  # chromium
-])
+    focus_debouncer(window)
+
+float_rules = floating.FloatRules(
+    wm_class=[
+        "x11-ssh-askpass",
+        "bubble"  # chromium
+    ],
+    wm_type=["dialog"],
+    transient=True,
+)
 
 
 def should_be_floating(w):
-    wm_class = w.get_wm_class()
-    if wm_class is None:
-        return True
-    if isinstance(wm_class, tuple):
-        for cls in wm_class:
-            if cls.lower() in float_windows:
-                return True
-    else:
-        if wm_class.lower() in float_windows:
-            return True
-    return w.get_wm_type() == 'dialog' or bool(w.get_wm_transient_for())
+    return float_rules.should_float(w)
 
 
 @hook.subscribe.client_new
@@ -0,0 +1,95 @@
+import re
+
+import xcffib.xproto
+from libqtile import xcbq
+
+PROPERTIES = ('WM_CLASS', '_NET_WM_WINDOW_TYPE', 'WM_WINDOW_ROLE',
+              'WM_TRANSIENT_FOR')
+
+
+def fetch_properties(window):
+    """
+        Read everything the float rules look at in one round-trip: all
+        GetProperty requests are sent before the first reply is waited
+        for. Returns (wm_class, wm_type, role, transient_for).
+    """
+    core = window.conn.conn.core
+    atoms = window.conn.atoms
+    cookies = [
+        core.GetProperty(False, window.wid, atoms[name],
+                         xcffib.xproto.GetPropertyType.Any, 0, 2 ** 32 - 1)
+        for name in PROPERTIES
+    ]
+    wm_class, wm_type, role, transient = [c.reply() for c in cookies]
+
+    # an empty tuple if there is no WM_CLASS, like xcbq's get_wm_class()
+    if wm_class.value_len:
+        wm_class = tuple(wm_class.value.to_string().strip('\0').split('\0'))
+    else:
+        wm_class = ()
+    if wm_type.value_len:
+        name = atoms.get_name(wm_type.value.to_atoms()[0])
+        wm_type = xcbq.WindowTypes.get(name, name)
+    else:
+        wm_type = None
+    role = role.value.to_string().strip('\0') if role.value_len else None
+    transient = bool(transient.value_len and transient.value.to_atoms()[0])
+    return wm_class, wm_type, role, transient
+
+
+class FloatRules(object):
+    """
+        Decides whether a new window should float. The rules are compiled
+        once and decisions are memoized by window properties, so a stream
+        of short-lived dialogs of the same application costs one X
+        round-trip and one dict lookup each.
+
+        - wm_class: class or instance names matched exactly (lowercase)
+        - wm_class_prefix: prefixes of class or instance names (lowercase)
+        - wm_class_regex: regular expressions searched in class names
+        - wm_type: window types, as returned by xcbq, e.g. 'dialog'
+        - role: WM_WINDOW_ROLE values
+        - transient: float every window that is transient for another one
+        - max_cache: number of decisions to remember
+    """
+    def __init__(self, wm_class=(), wm_class_prefix=(), wm_class_regex=(),
+                 wm_type=('dialog',), role=(), transient=True,
+                 max_cache=1024):
+        self.wm_class = frozenset(c.lower() for c in wm_class)
+        self.wm_class_prefix = tuple(p.lower() for p in wm_class_prefix)
+        self.wm_class_regex = [re.compile(r) for r in wm_class_regex]
+        self.wm_type = frozenset(wm_type)
+        self.role = frozenset(role)
+        self.transient = transient
+        self.max_cache = max_cache
+        self.cache = {}
+
+    def _match_class(self, wm_class):
+        for cls in wm_class:
+            lower = cls.lower()
+            if lower in self.wm_class:
+                return True
+            if self.wm_class_prefix and lower.startswith(self.wm_class_prefix):
+                return True
+            for regex in self.wm_class_regex:
+                if regex.search(cls):
+                    return True
+        return False
+
+    def classify(self, wm_class, wm_type, role, transient):
+        key = (wm_class, wm_type, role, transient)
+        try:
+            return self.cache[key]
+        except KeyError:
+            pass
+        result = (self._match_class(wm_class) or
+                  wm_type in self.wm_type or
+                  role in self.role or
+                  (self.transient and transient))
+        if len(self.cache) >= self.max_cache:
+            self.cache.clear()
+        self.cache[key] = result
+        return result
+
+    def should_float(self, window):
+        return self.classify(*fetch_properties(window))
@@ -0,0 +1,110 @@
+import os
+import functools
+import subprocess
+
+import cairocffi
+import xcffib.xproto
+
+from libqtile.log_utils import logger
+
+# i3lock reads raw images since 2.11, bgrx is the layout of a 24 bit
+# ZPixmap as the X server hands it out on little endian machines
+LOCK_COMMAND = ['i3lock', '--raw', '{width}x{height}:bgrx',
+                '--image', '/dev/fd/{fd}']
+PIXELATE = 8
+# tried in order when LOCK_COMMAND can't be run or fails, e.g. with an
+# i3lock older than 2.11
+FALLBACK_COMMANDS = (['i3lock'], ['i3lock-spy'])
+
+
+def grab_root(qtile):
+    """Return (width, height, pixels) of the root window as BGRX"""
+    screen = qtile.conn.default_screen
+    width, height = screen.width_in_pixels, screen.height_in_pixels
+    reply = qtile.conn.conn.core.GetImage(
+        xcffib.xproto.ImageFormat.ZPixmap, screen.root.wid, 0, 0, width,
+        height, 0xffffffff).reply()
+    return width, height, bytearray(reply.data.buf())
+
+
+def pixelate(width, height, pixels, factor=PIXELATE):
+    """
+        Scale the image down and back up with nearest neighbour filtering,
+        in place on the raw buffer.
+    """
+    stride = cairocffi.ImageSurface.format_stride_for_width(
+        cairocffi.FORMAT_RGB24, width)
+    image = cairocffi.ImageSurface.create_for_data(
+        pixels, cairocffi.FORMAT_RGB24, width, height, stride)
+    small = cairocffi.ImageSurface(cairocffi.FORMAT_RGB24,
+                                   max(width // factor, 1),
+                                   max(height // factor, 1))
+    ctx = cairocffi.Context(small)
+    ctx.scale(1.0 / factor, 1.0 / factor)
+    ctx.set_source_surface(image)
+    ctx.paint()
+
+    ctx = cairocffi.Context(image)
+    ctx.scale(factor, factor)
+    ctx.set_source_surface(small)
+    ctx.get_source().set_filter(cairocffi.FILTER_NEAREST)
+    ctx.set_operator(cairocffi.OPERATOR_SOURCE)
+    ctx.paint()
+    image.flush()
+
+
+def lock_plain(qtile):
+    """Lock with the first of FALLBACK_COMMANDS that can be started"""
+    for command in FALLBACK_COMMANDS:
+        try:
+            locker = subprocess.Popen(command)
+        except OSError as e:
+            logger.warning('Cannot run %s: %s', command[0], e)
+            continue
+        qtile.run_in_executor(locker.wait)
+        return
+    logger.error('No screen locker could be started, the screen is not '
+                 'locked')
+
+
+def _locker_exited(qtile, command, future):
+    status = future.result()
+    if status != 0:
+        logger.warning('%s exited with status %s, locking without the '
+                       'screenshot', command, status)
+        lock_plain(qtile)
+
+
+def lock_screen(qtile, command=LOCK_COMMAND, factor=PIXELATE):
+    """
+        Lock with a pixelated screenshot. The capture stays in memory: it
+        is taken from the X connection qtile already has, pixelated on the
+        raw buffer and handed to the locker as a memfd, so there is no
+        shell, no scrot and no PNG written to or read from /tmp. If any
+        of that fails the screen is locked with a plain locker.
+    """
+    try:
+        width, height, pixels = grab_root(qtile)
+        if factor > 1:
+            pixelate(width, height, pixels, factor)
+    except Exception:
+        logger.exception('Failed to capture the screen, locking without it')
+        lock_plain(qtile)
+        return
+    try:
+        fd = os.memfd_create('lockscreen')
+        try:
+            os.write(fd, pixels)
+            args = [a.format(width=width, height=height, fd=fd)
+                    for a in command]
+            locker = subprocess.Popen(args, pass_fds=(fd,))
+        finally:
+            os.close(fd)
+    except OSError as e:
+        logger.warning('Cannot run %s: %s', command[0], e)
+        lock_plain(qtile)
+        return
+    # i3lock forks once the screen is locked and the parent exits with 0,
+    # anything else means the screen is not locked
+    qtile.run_in_executor(locker.wait).add_done_callback(
+        functools.partial(_locker_exited, qtile, command[0]))
@@ -0,0 +1,85 @@
+import re
+import functools
+
+from libqtile.config import Match
+
+from floating import fetch_properties
+
+
+class RoutedMatch(Match):
+    """
+        A Match that asks the router for the window's group instead of
+        comparing its own rules, see GroupRouter.match().
+    """
+    def __init__(self, router, group):
+        Match.__init__(self)
+        self.router = router
+        self.group = group
+
+    def compare(self, client):
+        return self.router.route(client) == self.group
+
+
+class GroupRouter(object):
+    """
+        Index of window-to-group rules. Class names and roles are looked
+        up in dicts, only regular expressions are tried one by one, and
+        results are cached per (wm_class, role). The first group that was
+        added wins when several match, like qtile's own rule order.
+
+        qtile still calls compare() on the match of every group, but each
+        call is a comparison against the cached route of the window, and
+        the window properties are fetched once in a single round-trip.
+    """
+    def __init__(self, max_cache=256):
+        self.groups = []
+        self.wm_class = {}
+        self.role = {}
+        self.regex = []
+        self.lookup = functools.lru_cache(maxsize=max_cache)(self._lookup)
+        self.last = (None, None)
+
+    def match(self, group, wm_class=(), role=(), regex=()):
+        """
+            Add rules for a group and return the Match to put in its
+            matches. wm_class and role are compared case insensitively,
+            regex is searched in the class names.
+        """
+        order = len(self.groups)
+        self.groups.append(group)
+        for cls in wm_class:
+            self.wm_class.setdefault(cls.lower(), order)
+        for r in role:
+            self.role.setdefault(r.lower(), order)
+        for r in regex:
+            self.regex.append((re.compile(r), order))
+        self.lookup.cache_clear()
+        return RoutedMatch(self, group)
+
+    def _lookup(self, wm_class, role):
+        hits = []
+        for cls in wm_class or ():
+            order = self.wm_class.get(cls.lower())
+            if order is not None:
+                hits.append(order)
+        if role:
+            order = self.role.get(role.lower())
+            if order is not None:
+                hits.append(order)
+        for regex, order in self.regex:
+            if any(regex.search(cls) for cls in wm_class or ()):
+                hits.append(order)
+                break
+        if hits:
+            return self.groups[min(hits)]
+        return None
+
+    def route(self, client):
+        """Return the name of the group the client belongs to, or None"""
+        last_client, group = self.last
+        if client is last_client:
+            return group
+        wm_class, wm_type, role, transient = fetch_properties(client.window)
+        group = self.lookup(wm_class, role)
+        self.last = (client, group)
+        return group
@@ -0,0 +1,161 @@
+import errno
+import struct
+from types import SimpleNamespace
+
+import pytest
+import xcffib.xproto
+
+from widgets.backlight import SysfsBacklight
+
+
+class Widget(object):
+    qtile = None
+
+    def __init__(self):
+        self.updates = []
+
+    def update(self, percent):
+        self.updates.append(percent)
+
+
+@pytest.fixture
+def sysfs(tmp_path):
+    for name, type, brightness in (('acpi_video0', 'firmware', 500),
+                                   ('intel_backlight', 'raw', 40)):
+        device = tmp_path / name
+        device.mkdir()
+        (device / 'type').write_text(type + '\n')
+        (device / 'max_brightness').write_text('1000\n')
+        (device / 'brightness').write_text('%d\n' % brightness)
+    return tmp_path
+
+
+def brightness(sysfs, name='acpi_video0'):
+    return int((sysfs / name / 'brightness').read_text())
+
+
+def test_change(sysfs):
+    backlight = SysfsBacklight(str(sysfs))
+    widget = Widget()
+    backlight.subscribe(widget)
+    assert widget.updates == [50.0]
+
+    backlight.increase(None)
+    assert brightness(sysfs) == 600
+    backlight.decrease(None, 20)
+    assert brightness(sysfs) == 400
+    assert widget.updates == [50.0, 60.0, 40.0]
+
+    backlight.unsubscribe(widget)
+    backlight.increase(None)
+    assert brightness(sysfs) == 500
+    assert widget.updates == [50.0, 60.0, 40.0]
+
+
+def test_clamp(sysfs):
+    backlight = SysfsBacklight(str(sysfs))
+    backlight.increase(None, 80)
+    assert brightness(sysfs) == 1000
+    assert backlight.get() == 100.0
+    backlight.decrease(None, 150)
+    assert brightness(sysfs) == 0
+
+
+def test_named_device(sysfs):
+    backlight = SysfsBacklight(str(sysfs), 'intel_backlight')
+    assert backlight.get() == 4.0
+    backlight.set(5)
+    assert brightness(sysfs, 'intel_backlight') == 50
+    assert brightness(sysfs) == 500
+
+
+def test_missing_device(tmp_path):
+    backlight = SysfsBacklight(str(tmp_path))
+    widget = Widget()
+    backlight.subscribe(widget)
+    backlight.increase(None)
+    assert widget.updates == []
+
+    backlight = SysfsBacklight(str(tmp_path / 'missing'))
+    backlight.decrease(None)
+
+
+def test_device_type(sysfs):
+    (sysfs / 'acpi_video0' / 'type').write_text('raw\n')
+    device = sysfs / 'nv_backlight'
+    device.mkdir()
+    (device / 'type').write_text('platform\n')
+    (device / 'max_brightness').write_text('100\n')
+    (device / 'brightness').write_text('70\n')
+    assert SysfsBacklight(str(sysfs)).get() == 70.0
+
+    (device / 'type').unlink()
+    assert SysfsBacklight(str(sysfs)).get() == 50.0
+
+
+def reply(**fields):
+    return SimpleNamespace(reply=lambda: SimpleNamespace(**fields))
+
+
+class Data(bytes):
+    def buf(self):
+        return self
+
+
+class FakeRandr(object):
+    """Output 1 has no Backlight property, output 2 ranges from 0 to 200"""
+    BACKLIGHT = 300
+
+    def __init__(self):
+        self.values = {2: 100}
+        self.core = self
+
+    def __call__(self, key):
+        return self
+
+    def InternAtom(self, only_if_exists, length, name):
+        atom = self.BACKLIGHT if name == 'Backlight' else 0
+        return reply(atom=atom)
+
+    def GetScreenResourcesCurrent(self, window):
+        return reply(outputs=[1, 2])
+
+    def GetOutputProperty(self, output, atom, type, offset, length,
+                          delete, pending):
+        assert atom == self.BACKLIGHT
+        if output not in self.values:
+            return reply(type=0, format=0, num_items=0, data=Data())
+        return reply(type=xcffib.xproto.Atom.INTEGER, format=32, num_items=1,
+                     data=Data(struct.pack('=i', self.values[output])))
+
+    def QueryOutputProperty(self, output, atom):
+        return reply(range=True, validValues=[0, 200])
+
+    def ChangeOutputProperty(self, output, atom, type, format, mode, units,
+                             data):
+        self.values[output] = struct.unpack('=i', data)[0]
+
+
+def test_randr_fallback(sysfs, monkeypatch):
+    def read_only():
+        raise PermissionError(errno.EACCES, 'Permission denied')
+    randr = FakeRandr()
+    conn = SimpleNamespace(conn=randr, flush=lambda: None,
+                           default_screen=SimpleNamespace(
+                               root=SimpleNamespace(wid=1)))
+    qtile = SimpleNamespace(conn=conn)
+    backlight = SysfsBacklight(str(sysfs))
+    monkeypatch.setattr(backlight, '_open', read_only)
+    widget = Widget()
+    widget.qtile = qtile
+    backlight.subscribe(widget)
+    backlight.increase(qtile)
+    assert randr.values == {2: 120}
+    assert widget.updates == [50.0, 60.0]
+    assert brightness(sysfs) == 500
+
+    # without a connection, nothing to fall back to
+    backlight = SysfsBacklight(str(sysfs))
+    monkeypatch.setattr(backlight, '_open', read_only)
+    backlight.increase(None)
+    assert randr.values == {2: 120}
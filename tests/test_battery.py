@@ -0,0 +1,150 @@
+import pytest
+
+from widgets.battery import BatterySampler, BatteryTotal, read_uevent
+from widgets.snapshot import snapshot
+
+
+def uevent(**values):
+    return ''.join('POWER_SUPPLY_%s=%s\n' % (key.upper(), value)
+                   for key, value in sorted(values.items()))
+
+
+@pytest.fixture
+def power_supply(tmp_path):
+    def add(name, **values):
+        directory = tmp_path / name
+        directory.mkdir()
+        (directory / 'uevent').write_text(uevent(**values))
+    add('BAT0', type='Battery', status='Discharging', charge_now=2000000,
+        charge_full=4000000, current_now=1000000)
+    add('BAT1', type='Battery', status='Full', charge_now=3000000,
+        charge_full=3000000, current_now=0)
+    add('AC', type='Mains', online=0)
+    # a battery that is being removed
+    (tmp_path / 'BAT2').mkdir()
+    return tmp_path
+
+
+class Qtile(object):
+    def __init__(self):
+        self.later = []
+
+    def call_later(self, seconds, callback):
+        self.later.append((seconds, callback))
+
+
+def test_read_uevent(tmp_path):
+    path = tmp_path / 'uevent'
+    path.write_text('DEVTYPE=power_supply\n'
+                    'POWER_SUPPLY_NAME=BAT0\n'
+                    'POWER_SUPPLY_STATUS=Not charging\n'
+                    'POWER_SUPPLY_MODEL_NAME=a=b\n')
+    assert read_uevent(str(path)) == {
+        'name': 'BAT0',
+        'status': 'Not charging',
+        'model_name': 'a=b',
+    }
+
+
+def test_read_only_batteries(power_supply):
+    sampler = BatterySampler(Qtile(), str(power_supply))
+    snapshot = sampler.read()
+    assert sorted(snapshot) == ['BAT0', 'BAT1']
+    assert snapshot['BAT0']['charge_now'] == '2000000'
+
+
+def test_read_missing_directory(tmp_path):
+    sampler = BatterySampler(Qtile(), str(tmp_path / 'missing'))
+    assert sampler.read() == {}
+
+
+@pytest.mark.parametrize('snapshot, interval', [
+    ({}, 60),
+    ({'BAT0': {'status': 'Full'}}, 60),
+    ({'BAT0': {'status': 'Charging'}}, 60),
+    ({'BAT0': {'status': 'Discharging', 'energy_now': '20',
+               'power_now': '10'}}, 10),
+    # less than low_time hours left
+    ({'BAT0': {'status': 'Discharging', 'energy_now': '4',
+               'power_now': '10'}}, 5),
+    ({'BAT0': {'status': 'Discharging', 'charge_now': '4',
+               'current_now': '10'}}, 5),
+    ({'BAT0': {'status': 'Discharging', 'charge_now': '4',
+               'current_now': '0'}}, 10),
+    ({'BAT0': {'status': 'Discharging'}}, 10),
+    ({'BAT0': {'status': 'Full'},
+      'BAT1': {'status': 'Discharging', 'energy_now': '4',
+               'power_now': '10'}}, 5),
+])
+def test_next_interval(snapshot, interval):
+    sampler = BatterySampler(Qtile(), interval=10)
+    sampler.snapshot = snapshot
+    assert sampler.next_interval() == interval
+
+
+def test_sample_schedules_next(power_supply):
+    qtile = Qtile()
+    sampler = BatterySampler(qtile, str(power_supply), interval=10)
+    sampler.sample()
+    # BAT0 has two hours left
+    assert qtile.later == [(10, sampler.sample)]
+
+
+class Widget(object):
+    def update(self):
+        pass
+
+
+def test_unsubscribe_saves_snapshot(power_supply, tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot, 'path', str(tmp_path / 'snapshot.json'))
+    monkeypatch.setattr(snapshot, 'restored', {})
+    monkeypatch.setattr(snapshot, 'saved', {})
+    sampler = BatterySampler(Qtile(), str(power_supply))
+    first, second = Widget(), Widget()
+    sampler.subscribe(first)
+    sampler.subscribe(second)
+    # the other widget may never be finalized
+    sampler.unsubscribe(first)
+    key = 'battery ' + str(power_supply)
+    assert snapshot.saved[key] == sampler.snapshot
+    assert sorted(snapshot.saved[key]) == ['BAT0', 'BAT1']
+
+
+def total(snapshot):
+    widget = BatteryTotal()
+    widget.sampler = BatterySampler(Qtile())
+    widget.sampler.snapshot = snapshot
+    return widget._get_info()
+
+
+def test_total(power_supply):
+    assert total(BatterySampler(Qtile(), str(power_supply)).read()) == {
+        'stat': 'Discharging',
+        'now': 5000000.0,
+        'full': 7000000.0,
+        'power': 1000000.0,
+    }
+
+
+def test_total_status():
+    full = {'status': 'Full', 'energy_now': '1', 'energy_full': '1',
+            'power_now': '0'}
+    charging = dict(full, status='Charging')
+    discharging = dict(full, status='Discharging')
+    assert total({'BAT0': full, 'BAT1': full})['stat'] == 'Full'
+    assert total({'BAT0': full, 'BAT1': charging})['stat'] == 'Charging'
+    assert total({'BAT0': discharging,
+                  'BAT1': charging})['stat'] == 'Discharging'
+    assert total({'BAT0': charging,
+                  'BAT1': discharging})['stat'] == 'Discharging'
+
+
+def test_total_skips_incomplete():
+    assert total({}) is False
+    assert total({'BAT0': {'status': 'Unknown'}}) is False
+    info = total({
+        'BAT0': {'status': 'Unknown'},
+        'BAT1': {'status': 'Full', 'energy_now': '1', 'energy_full': '2',
+                 'power_now': '0'},
+    })
+    assert info == {'stat': 'Full', 'now': 1.0, 'full': 2.0, 'power': 0.0}
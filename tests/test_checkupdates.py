@@ -0,0 +1,96 @@
+import os
+import json
+import time
+import asyncio
+
+import pytest
+
+from widgets.checkupdates import CheckUpdates
+
+
+class Qtile(object):
+    def __init__(self, loop):
+        self._eventloop = loop
+        self.later = []
+
+    def call_later(self, seconds, callback, *args):
+        self.later.append(seconds)
+        return self._eventloop.call_later(seconds, callback, *args)
+
+
+@pytest.fixture
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+def make_widget(loop, tmp_path, script, **config):
+    widget = CheckUpdates(command=['sh', '-c', script],
+                          cache_file=str(tmp_path / 'cache.json'),
+                          database=str(tmp_path), **config)
+    widget.qtile = Qtile(loop)
+    widget.shown = []
+    widget._show = lambda: widget.shown.append(widget.updates)
+    return widget
+
+
+def count(loop, tmp_path, script, **config):
+    widget = make_widget(loop, tmp_path, script, **config)
+    return loop.run_until_complete(widget._count())
+
+
+def test_count_lines(loop, tmp_path):
+    assert count(loop, tmp_path,
+                 'printf "linux 4.8-1 -> 4.9-1\\n\\nqtile 0.10.6 -> 0.10.7\\n"'
+                 ) == 2
+
+
+def test_no_updates(loop, tmp_path):
+    # checkupdates exits with 2 when there is nothing to update
+    assert count(loop, tmp_path, 'exit 2') == 0
+
+
+def test_failure(loop, tmp_path):
+    assert count(loop, tmp_path, 'echo "==> ERROR"; exit 1') is None
+
+
+def test_missing_command(loop, tmp_path):
+    widget = make_widget(loop, tmp_path, '')
+    widget.command = [str(tmp_path / 'missing')]
+    assert loop.run_until_complete(widget._count()) is None
+
+
+def test_timeout_kills(loop, tmp_path):
+    pid_file = tmp_path / 'pid'
+    start = time.monotonic()
+    assert count(loop, tmp_path, 'echo $$ > %s; exec sleep 30' % pid_file,
+                 timeout=0.2) is None
+    assert time.monotonic() - start < 5
+    pid = int(pid_file.read_text())
+    # killed and reaped
+    with pytest.raises(ProcessLookupError):
+        os.kill(pid, 0)
+
+
+def test_check_caches_and_reschedules(loop, tmp_path):
+    widget = make_widget(loop, tmp_path, 'echo a; echo b; echo c',
+                         update_interval=3600)
+    widget.check()
+    loop.run_until_complete(widget.task)
+    assert widget.shown == [3]
+    assert widget.qtile.later == [3600]
+    with open(widget.cache_file) as f:
+        assert json.load(f)['updates'] == 3
+    widget.finalize()
+
+
+def test_failed_check_keeps_result(loop, tmp_path):
+    widget = make_widget(loop, tmp_path, 'exit 1', update_interval=3600)
+    widget.updates = 5
+    widget.check()
+    loop.run_until_complete(widget.task)
+    assert widget.updates == 5
+    assert widget.shown == []
+    assert widget.qtile.later == [3600]
+    widget.finalize()
@@ -0,0 +1,91 @@
+import os
+import json
+import random
+import string
+
+import pytest
+
+from widgets.launcher import ExecutableIndex
+
+
+@pytest.fixture
+def bin_path(tmp_path, monkeypatch):
+    directory = tmp_path / 'bin'
+    directory.mkdir()
+    for name in ('git', 'gitk', 'grep', 'mpc', 'vim'):
+        path = directory / name
+        path.write_text('')
+        path.chmod(0o755)
+    (directory / 'README').write_text('')
+    monkeypatch.setenv('PATH', '%s:%s' % (tmp_path / 'missing', directory))
+    return directory
+
+
+@pytest.fixture
+def index(tmp_path):
+    return ExecutableIndex(str(tmp_path / 'cache' / 'launcher.json'),
+                           str(tmp_path / 'cache' / 'launcher-usage.json'))
+
+
+def test_refresh(bin_path, index):
+    index.refresh()
+    assert index.names == ['git', 'gitk', 'grep', 'mpc', 'vim']
+    mtime = os.stat(index.path).st_mtime_ns
+
+    # the missing directory in $PATH does not count as a change
+    os.utime(index.path, ns=(0, 0))
+    index.refresh()
+    assert os.stat(index.path).st_mtime_ns == 0
+
+    reloaded = ExecutableIndex(index.path, index.usage_path)
+    reloaded.refresh()
+    assert reloaded.names == index.names
+    assert os.stat(index.path).st_mtime_ns == 0
+    assert mtime != 0
+
+
+def test_used_writes_usage_only(bin_path, index):
+    index.refresh()
+    os.utime(index.path, ns=(0, 0))
+    index.used('vim')
+    index.used('vim')
+    assert os.stat(index.path).st_mtime_ns == 0
+    with open(index.usage_path) as f:
+        assert list(json.load(f)) == ['vim']
+
+    reloaded = ExecutableIndex(index.path, index.usage_path)
+    reloaded.refresh()
+    assert reloaded.search('') == ['vim', 'git', 'mpc', 'gitk', 'grep']
+    assert reloaded.search('g') == ['git', 'gitk', 'grep']
+    assert reloaded.search('gk') == ['gitk']
+
+
+def test_search_large_index(index):
+    rng = random.Random(0)
+    names = set()
+    while len(names) < 30000:
+        names.add(''.join(rng.choice(string.ascii_lowercase + '-')
+                          for _ in range(rng.randint(2, 20))))
+    index.loaded = True
+    index.names = sorted(names)
+    index.blob = '\n'.join(index.names)
+    used = index.names[12345]
+    index.usage = {used: [3, 0.0]}
+
+    prefix = used[:2]
+    result = index.search(prefix)
+    assert result[0] == used
+    assert len(set(result)) == len(result) == 100
+    # every prefix match before the fuzzy ones, shortest first
+    matches = sum(1 for name in names if name.startswith(prefix))
+    assert all(name.startswith(prefix) for name in result[:matches])
+    assert not any(name.startswith(prefix) for name in result[matches:])
+    lengths = [len(name) for name in result[1:min(matches, 100)]]
+    assert lengths == sorted(lengths)
+
+    fuzzy = index.search('qzx', limit=1000)
+    for name in fuzzy:
+        assert name.index('q') < name.index('z', name.index('q')) < \
+            name.index('x', name.index('z', name.index('q')))
+    assert fuzzy == [n for n in fuzzy if n.startswith('qzx')] + \
+        [n for n in fuzzy if not n.startswith('qzx')]
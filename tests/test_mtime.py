@@ -0,0 +1,173 @@
+import os
+import time
+import asyncio
+
+import pytest
+
+from widgets.mtime import Mtime
+from widgets.snapshot import snapshot
+from widgets.timerfd import wall_clock
+
+
+class Clock(object):
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class Timer(object):
+    """Records the deadline instead of arming a timerfd"""
+    armed = []
+
+    def __init__(self, loop, deadline, callback):
+        self.deadline = deadline
+        self.callback = callback
+        self.cancelled = False
+        self.armed.append(self)
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class Qtile(object):
+    def __init__(self, loop):
+        self._eventloop = loop
+        self.call_soon = loop.call_soon
+        self.later = []
+
+    def call_later(self, seconds, callback, *args):
+        self.later.append(seconds)
+        return self._eventloop.call_later(seconds, callback, *args)
+
+
+@pytest.fixture
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.fixture
+def path(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot, 'path', str(tmp_path / 'snapshot.json'))
+    monkeypatch.setattr(snapshot, 'restored', {})
+    Timer.armed = []
+    path = tmp_path / 'backup'
+    path.write_text('')
+    os.utime(str(path), (1000, 1000))
+    return str(path)
+
+
+def make_widget(loop, path, now, **config):
+    config.setdefault('update_interval', 0.01)
+    widget = Mtime(file=path, time_threshold=100, text_older_threshold='old',
+                   text_younger_threshold='new', **config)
+    widget.clock = Clock(now)
+    widget.timer = Timer
+    widget.qtile = Qtile(loop)
+    widget.texts = []
+    widget.update = widget.texts.append
+    return widget
+
+
+def run(loop, seconds):
+    loop.run_until_complete(asyncio.sleep(seconds))
+
+
+def test_inotify_sleeps_until_threshold(loop, path):
+    widget = make_widget(loop, path, 1010)
+    widget.timer_setup()
+    assert widget.watching
+    assert widget.texts == ['new']
+    assert [t.deadline for t in Timer.armed] == [1100]
+
+    # many update_intervals pass without a wakeup, stat or redraw
+    widget.clock.now = 1099
+    run(loop, 0.1)
+    assert widget.texts == ['new']
+    assert widget.qtile.later == []
+    assert len(Timer.armed) == 1
+
+    widget.clock.now = 1100.5
+    Timer.armed[0].callback()
+    assert widget.texts == ['new', 'old']
+    assert len(Timer.armed) == 1
+    widget.finalize()
+
+
+def test_inotify_rearms_on_change(loop, path):
+    widget = make_widget(loop, path, 1010)
+    widget.timer_setup()
+    os.utime(path, (1050, 1050))
+    run(loop, 0.05)
+    assert widget.texts == ['new', 'new']
+    assert [t.deadline for t in Timer.armed] == [1100, 1150]
+    assert Timer.armed[0].cancelled
+
+    os.unlink(path)
+    run(loop, 0.05)
+    assert widget.texts[-1] == 'File not found'
+    assert Timer.armed[1].cancelled
+    assert len(Timer.armed) == 2
+    widget.finalize()
+
+
+def test_inotify_early_wakeup_rearms(loop, path):
+    # the clock was set back after the timer was armed
+    widget = make_widget(loop, path, 1010)
+    widget.timer_setup()
+    widget.clock.now = 1090
+    Timer.armed[0].callback()
+    assert widget.texts == ['new', 'new']
+    assert [t.deadline for t in Timer.armed] == [1100, 1100]
+    widget.finalize()
+
+
+def test_polling_waits_for_transition(loop, path):
+    widget = make_widget(loop, path, 1090, use_inotify=False,
+                         update_interval=600)
+    widget.timer_setup()
+    assert not widget.watching
+    assert widget.texts == ['new']
+    assert widget.qtile.later == [pytest.approx(10.01)]
+    assert Timer.armed == []
+
+
+def test_wall_clock(loop):
+    fired = []
+    now = time.time()
+    wall_clock.call_at(loop, now + 0.03, lambda: fired.append('later'))
+    wall_clock.call_at(loop, now + 0.02, lambda: fired.append('soon'))
+    fd = wall_clock.fileno()
+    cancelled = wall_clock.call_at(loop, now + 0.01,
+                                   lambda: fired.append('cancelled'))
+    wall_clock.call_at(loop, now - 60, lambda: fired.append('past'))
+    # every deadline shares one timerfd
+    assert wall_clock.fileno() == fd
+    cancelled.cancel()
+    run(loop, 0.1)
+    assert fired == ['past', 'soon', 'later']
+    # closed without deadlines
+    assert wall_clock.fileno() == -1
+
+
+def test_widgets_share_timerfd(loop, path):
+    os.utime(path, (time.time(), time.time()))
+    fds = len(os.listdir('/proc/self/fd'))
+    widgets = []
+    for i in range(10):
+        widget = make_widget(loop, path, 0)
+        # the real clock and the shared timerfd
+        del widget.clock
+        del widget.timer
+        widget.timer_setup()
+        widgets.append(widget)
+    assert len(set(w.threshold_timer.clock for w in widgets)) == 1
+    # the inotify fd and the timerfd
+    assert len(os.listdir('/proc/self/fd')) == fds + 2
+    for widget in widgets:
+        widget.finalize()
+    assert wall_clock.fileno() == -1
+    assert len(os.listdir('/proc/self/fd')) == fds
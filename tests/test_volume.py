@@ -0,0 +1,171 @@
+import os
+import time
+import select
+import threading
+from types import SimpleNamespace
+
+import pulsectl
+
+from widgets import volume
+from widgets.volume import PulseMixer
+
+
+class Qtile(object):
+    def __init__(self):
+        self.calls = []
+
+    def call_soon_threadsafe(self, func, *args):
+        self.calls.append(args)
+
+
+class Pulse(object):
+    """Stands in for a pulsectl.Pulse with a single sink"""
+    def __init__(self, value=0.5, mute=False):
+        self.value = value
+        self.muted = mute
+        self.calls = []
+        self.stops = 0
+
+    def server_info(self):
+        return SimpleNamespace(default_sink_name='sink')
+
+    def get_sink_by_name(self, name):
+        return SimpleNamespace(name=name, mute=int(self.muted),
+                               volume=SimpleNamespace(value_flat=self.value))
+
+    def volume_set_all_chans(self, sink, value):
+        self.calls.append(('volume', value))
+        self.value = value
+
+    def mute(self, sink, mute):
+        self.calls.append(('mute', mute))
+        self.muted = mute
+
+    def event_listen_stop(self):
+        self.stops += 1
+
+
+class PollFd(object):
+    def __init__(self, fd, events):
+        self.fd = fd
+        self.events = events
+        self.revents = 0
+
+
+def make_mixer():
+    mixer = PulseMixer()
+    mixer.qtile = Qtile()
+    # keys don't start the thread, the tests call _apply() and run()
+    mixer.thread = threading.current_thread()
+    mixer.subscribers.append(SimpleNamespace(update=None))
+    return mixer
+
+
+def test_held_key_coalesces():
+    mixer = make_mixer()
+    pulse = Pulse(0.5, mute=True)
+    for i in range(3):
+        mixer.raise_volume(None)
+    mixer.lower_volume(None)
+    mixer._apply(pulse)
+    assert pulse.calls == [('volume', 0.6), ('mute', False)]
+    assert mixer.qtile.calls == [(60, False)]
+
+    # nothing pending, nothing changed
+    mixer._apply(pulse)
+    assert len(pulse.calls) == 2
+    assert len(mixer.qtile.calls) == 1
+
+
+def test_volume_limits():
+    mixer = make_mixer()
+    pulse = Pulse(0.98)
+    mixer.raise_volume(None)
+    mixer._apply(pulse)
+    assert pulse.calls == [('volume', 1)]
+    mixer.change(None, -150)
+    mixer._apply(pulse)
+    assert pulse.calls[-1] == ('volume', 0)
+
+
+def test_toggle_mute():
+    mixer = make_mixer()
+    pulse = Pulse()
+    mixer.toggle_mute(None)
+    mixer._apply(pulse)
+    assert pulse.calls == [('mute', True)]
+    assert mixer.qtile.calls == [(50, True)]
+    # pressed twice before the thread got to it
+    mixer.toggle_mute(None)
+    mixer.toggle_mute(None)
+    mixer._apply(pulse)
+    assert pulse.calls == [('mute', True)]
+
+
+def test_wake_before_poll_is_not_lost():
+    mixer = make_mixer()
+    pulse = Pulse()
+    # a key press between the busy check and event_listen()
+    mixer._wake()
+    start = time.monotonic()
+    assert mixer._poll(pulse, [], -1) == 0
+    assert time.monotonic() - start < 1
+    assert pulse.stops == 1
+    # the wakeup is consumed
+    mixer._poll(pulse, [], 0)
+    assert pulse.stops == 1
+
+
+def test_poll_pulse_fds():
+    mixer = make_mixer()
+    pulse = Pulse()
+    r, w = os.pipe()
+    idle_r, idle_w = os.pipe()
+    try:
+        os.write(w, b'x')
+        fds = [PollFd(r, select.POLLIN), PollFd(idle_r, select.POLLIN)]
+        assert mixer._poll(pulse, fds, 0) == 1
+        assert [fd.revents for fd in fds] == [select.POLLIN, 0]
+        assert pulse.stops == 0
+    finally:
+        for fd in (r, w, idle_r, idle_w):
+            os.close(fd)
+
+
+def test_run_survives_disconnect(monkeypatch):
+    mixer = make_mixer()
+    mixer.reconnect_delay = 0
+    connections = []
+
+    class Connection(Pulse):
+        def __init__(self, client_name):
+            Pulse.__init__(self)
+            connections.append(self)
+            if len(connections) == 2:
+                raise RuntimeError('unexpected')
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc_info):
+            pass
+
+        def event_mask_set(self, *masks):
+            pass
+
+        def event_callback_set(self, callback):
+            pass
+
+        def set_poll_func(self, func, error_handler):
+            pass
+
+        def event_listen(self):
+            if len(connections) == 1:
+                # pulseaudio restarted
+                raise pulsectl.PulseDisconnected()
+            mixer.stopped = True
+
+    monkeypatch.setattr(volume.pulsectl, 'Pulse', Connection)
+    mixer.run()
+    assert len(connections) == 3
+    assert mixer.qtile.calls == [(50, False)]
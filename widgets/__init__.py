@@ -1,3 +1,35 @@
-from .mpd import Mpd
-from .mtime import Mtime
+import importlib
+
+from .factory import defer, call
+from .instrument import watch
+
+# widgets are imported on first use, so loading the config doesn't import
+# mpd, pulsectl or cairo for widgets created through defer()
+_widgets = {
+    'Backlight': 'backlight',
+    'Battery': 'battery',
+    'BatteryIcon': 'battery',
+    'BatteryTotal': 'battery',
+    'CheckUpdates': 'checkupdates',
+    'CPUGraph': 'graph',
+    'NetGraph': 'graph',
+    'Launcher': 'launcher',
+    'Memory': 'memory',
+    'Mpd': 'mpd',
+    'Mtime': 'mtime',
+    'Volume': 'volume',
+}
 #from .pulse import PulseAudio
+
+
+def __getattr__(name):
+    module = _widgets.get(name)
+    if module is not None:
+        return getattr(importlib.import_module('.' + module, __name__), name)
+    if not name.startswith('_'):
+        try:
+            return importlib.import_module('.' + name, __name__)
+        except ImportError as e:
+            if e.name != '%s.%s' % (__name__, name):
+                raise
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
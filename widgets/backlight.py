@@ -0,0 +1,206 @@
+import os
+import errno
+import struct
+
+import xcffib.randr
+import xcffib.xproto
+
+from libqtile import bar
+from libqtile.widget import base
+from libqtile.log_utils import logger
+
+BACKLIGHT = '/sys/class/backlight'
+
+# preferred control interfaces, see the kernel's sysfs-class-backlight ABI
+TYPES = ('firmware', 'platform', 'raw')
+
+
+def _device_type(path):
+    try:
+        with open(os.path.join(path, 'type')) as f:
+            return TYPES.index(f.read().strip())
+    except (OSError, ValueError):
+        return len(TYPES)
+
+
+class RandrBacklight(object):
+    """
+        The Backlight property of the RandR outputs, as set by xbacklight,
+        on qtile's own X connection. Needs no write access to sysfs, but a
+        driver that exposes the property. Raises OSError if no output has
+        one.
+    """
+    def __init__(self, conn):
+        self.conn = conn
+        self.ext = conn.conn(xcffib.randr.key)
+        self.atom = None
+        for name in ('Backlight', 'BACKLIGHT'):
+            reply = conn.conn.core.InternAtom(True, len(name), name).reply()
+            if reply.atom != xcffib.xproto.Atom._None:
+                self.atom = reply.atom
+                self.outputs = self._outputs()
+                if self.outputs:
+                    return
+        raise OSError(errno.ENODEV, 'No RandR output has a backlight')
+
+    def _outputs(self):
+        root = self.conn.default_screen.root.wid
+        resources = self.ext.GetScreenResourcesCurrent(root).reply()
+        outputs = []
+        for output in resources.outputs:
+            if self._value(output) is None:
+                continue
+            info = self.ext.QueryOutputProperty(output, self.atom).reply()
+            if info.range and len(info.validValues) == 2:
+                low, high = info.validValues
+                outputs.append((output, low, high))
+        return outputs
+
+    def _value(self, output):
+        reply = self.ext.GetOutputProperty(
+            output, self.atom, xcffib.xproto.Atom.Any, 0, 4, False,
+            False).reply()
+        if reply.type != xcffib.xproto.Atom.INTEGER or \
+                reply.format != 32 or reply.num_items != 1:
+            return None
+        return struct.unpack('=i', reply.data.buf())[0]
+
+    def get(self):
+        output, low, high = self.outputs[0]
+        return 100.0 * (self._value(output) - low) / (high - low)
+
+    def set(self, percent):
+        for output, low, high in self.outputs:
+            value = int(round(low + percent * (high - low) / 100.0))
+            self.ext.ChangeOutputProperty(
+                output, self.atom, xcffib.xproto.Atom.INTEGER, 32,
+                xcffib.xproto.PropMode.Replace, 1, struct.pack('=i', value))
+        self.conn.flush()
+
+
+class SysfsBacklight(object):
+    """
+        Sets the brightness by writing to sysfs from the event loop,
+        a single write(2) per key press instead of an xbacklight process.
+        Without a name, the device with the most preferred type is used.
+        If its brightness file is not writable by the user (there is no
+        udev rule giving the video group access), the RandR Backlight
+        property is set through qtile's X connection instead.
+
+        Subscribed widgets get update(percent) after every change.
+    """
+    def __init__(self, path=BACKLIGHT, name=None):
+        self.path = path
+        self.name = name
+        self.fd = None
+        self.max_brightness = None
+        self.randr = None
+        self.subscribers = []
+
+    def _device(self):
+        if self.name is None:
+            names = sorted(os.listdir(self.path))
+            self.name = min(names, key=lambda name: _device_type(
+                os.path.join(self.path, name)))
+        return os.path.join(self.path, self.name)
+
+    def _open(self):
+        if self.fd is None:
+            device = self._device()
+            with open(os.path.join(device, 'max_brightness')) as f:
+                self.max_brightness = int(f.read())
+            self.fd = os.open(os.path.join(device, 'brightness'),
+                              os.O_RDWR | os.O_CLOEXEC)
+        return self.fd
+
+    def _fallback(self, qtile):
+        """The RandR backlight once the sysfs one turned out read-only"""
+        if self.randr is None:
+            try:
+                self._open()
+            except PermissionError as e:
+                if qtile is None:
+                    raise
+                self.randr = RandrBacklight(qtile.conn)
+                logger.info('Using the RandR backlight: %s', e)
+        return self.randr
+
+    def get(self, qtile=None):
+        """Current brightness in percent"""
+        randr = self._fallback(qtile)
+        if randr is not None:
+            return randr.get()
+        value = int(os.pread(self.fd, 32, 0))
+        return 100.0 * value / self.max_brightness
+
+    def set(self, percent, qtile=None):
+        randr = self._fallback(qtile)
+        percent = min(max(percent, 0), 100)
+        if randr is not None:
+            randr.set(percent)
+        else:
+            value = int(round(percent * self.max_brightness / 100.0))
+            os.pwrite(self.fd, str(value).encode(), 0)
+        for widget in list(self.subscribers):
+            widget.update(percent)
+
+    def change(self, qtile, delta):
+        try:
+            self.set(self.get(qtile) + delta, qtile)
+        except (OSError, ValueError, IndexError) as e:
+            logger.warning('Cannot change backlight: %s', e)
+
+    def increase(self, qtile, step=10):
+        self.change(qtile, step)
+
+    def decrease(self, qtile, step=10):
+        self.change(qtile, -step)
+
+    def subscribe(self, widget):
+        self.subscribers.append(widget)
+        try:
+            widget.update(self.get(widget.qtile))
+        except (OSError, ValueError, IndexError) as e:
+            logger.warning('Cannot read backlight: %s', e)
+
+    def unsubscribe(self, widget):
+        if widget in self.subscribers:
+            self.subscribers.remove(widget)
+
+
+backlight = SysfsBacklight()
+
+
+class Backlight(base._TextBox):
+    """
+        Brightness of the backlight, updated when it is changed through
+        widgets.backlight.backlight. Scroll to change it.
+    """
+    orientations = base.ORIENTATION_HORIZONTAL
+    defaults = [
+        ("fmt", "☀ {:.0f}%", "Format of the brightness"),
+        ("step", 5, "Brightness step in percent for scrolling"),
+    ]
+
+    def __init__(self, **config):
+        base._TextBox.__init__(self, "☀", width=bar.CALCULATED, **config)
+        self.add_defaults(Backlight.defaults)
+
+    def timer_setup(self):
+        backlight.subscribe(self)
+
+    def finalize(self):
+        backlight.unsubscribe(self)
+        base._TextBox.finalize(self)
+
+    def update(self, percent):
+        text = self.fmt.format(percent)
+        if text != self.text:
+            self.text = text
+            self.bar.draw()
+
+    def button_press(self, x, y, button):
+        if button == 4:
+            backlight.increase(self.qtile, self.step)
+        elif button == 5:
+            backlight.decrease(self.qtile, self.step)
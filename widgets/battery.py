@@ -0,0 +1,199 @@
+import os
+
+from libqtile.widget import battery
+from libqtile.log_utils import logger
+
+from .snapshot import snapshot
+
+POWER_SUPPLY = '/sys/class/power_supply'
+
+_samplers = {}
+
+
+def get_sampler(qtile, path=POWER_SUPPLY, interval=5):
+    sampler = _samplers.get(path)
+    if sampler is None:
+        sampler = _samplers[path] = BatterySampler(qtile, path, interval)
+    return sampler
+
+
+def read_uevent(path):
+    """
+        Parse a power supply uevent file into a dict keyed like the
+        individual sysfs files, e.g. 'status' or 'charge_now'.
+    """
+    info = {}
+    with open(path) as f:
+        for line in f:
+            key, _, value = line.rstrip('\n').partition('=')
+            if key.startswith('POWER_SUPPLY_'):
+                info[key[len('POWER_SUPPLY_'):].lower()] = value
+    return info
+
+
+class BatterySampler(object):
+    """
+        Reads all batteries with one read of their uevent file per
+        interval and hands the snapshot to every subscribed widget.
+        Sampling slows down while on AC and speeds up when a battery
+        drains fast.
+
+        - interval: seconds between samples while discharging
+        - ac_factor: interval multiplier while nothing discharges
+        - low_time: hours to empty below which the interval is halved
+    """
+    ac_factor = 6
+    low_time = 0.5
+
+    def __init__(self, qtile, path=POWER_SUPPLY, interval=5):
+        self.qtile = qtile
+        self.path = path
+        self.interval = interval
+        self.snapshot = {}
+        self.subscribers = []
+        self.timer = None
+
+    def subscribe(self, widget):
+        self.subscribers.append(widget)
+        if self.timer is None:
+            restored = snapshot.restore('battery ' + self.path)
+            if restored is None:
+                self.sample()
+                return
+            # the last sample before a restart, read again on schedule
+            self.snapshot = restored
+            self.timer = self.qtile.call_later(self.next_interval(),
+                                               self.sample)
+        widget.update()
+
+    def unsubscribe(self, widget):
+        if widget in self.subscribers:
+            self.subscribers.remove(widget)
+        # qtile may finalize only some of the subscribers, any of them
+        # can be the last one
+        snapshot.save('battery ' + self.path, self.snapshot)
+        if not self.subscribers and self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+            _samplers.pop(self.path, None)
+
+    def read(self):
+        snapshot = {}
+        try:
+            names = os.listdir(self.path)
+        except OSError:
+            logger.exception('Cannot list %s', self.path)
+            return snapshot
+        for name in names:
+            try:
+                info = read_uevent(os.path.join(self.path, name, 'uevent'))
+            except OSError:
+                # batteries can be removed while we look at them
+                continue
+            if info.get('type') == 'Battery':
+                snapshot[name] = info
+        return snapshot
+
+    def next_interval(self):
+        """Seconds to the next sample, based on the last snapshot"""
+        interval = self.interval * self.ac_factor
+        for info in self.snapshot.values():
+            if info.get('status') != 'Discharging':
+                continue
+            interval = self.interval
+            now = info.get('energy_now', info.get('charge_now'))
+            rate = info.get('power_now', info.get('current_now'))
+            try:
+                if float(now) / float(rate) < self.low_time:
+                    return self.interval / 2
+            except (TypeError, ValueError, ZeroDivisionError):
+                pass
+        return interval
+
+    def sample(self):
+        self.snapshot = self.read()
+        for widget in list(self.subscribers):
+            try:
+                widget.update()
+            except Exception:
+                logger.exception('Failed to update %s', widget.name)
+        self.timer = self.qtile.call_later(self.next_interval(), self.sample)
+
+
+class _SampledBattery(object):
+    """
+        Mixin for the stock battery widgets that takes the values from
+        the shared sampler instead of reading sysfs on its own timer.
+    """
+    sampler = None
+
+    def timer_setup(self):
+        self.sampler = get_sampler(self.qtile, interval=self.update_delay)
+        self.sampler.subscribe(self)
+
+    def finalize(self):
+        if self.sampler is not None:
+            self.sampler.unsubscribe(self)
+        super(_SampledBattery, self).finalize()
+
+    def _value(self, info, option, fallbacks):
+        name = getattr(self, option)
+        for key in ((name,) if name else fallbacks):
+            if key in info:
+                return float(info[key])
+        raise KeyError(name or fallbacks[0])
+
+    def _info_from(self, info):
+        return {
+            'stat': info['status'],
+            'now': self._value(info, 'energy_now_file',
+                               ('energy_now', 'charge_now')),
+            'full': self._value(info, 'energy_full_file',
+                                ('energy_full', 'charge_full')),
+            'power': self._value(info, 'power_now_file',
+                                 ('power_now', 'current_now')),
+        }
+
+    def _get_info(self):
+        if self.sampler is None:
+            return False
+        info = self.sampler.snapshot.get(self.battery_name)
+        if info is None:
+            return False
+        try:
+            return self._info_from(info)
+        except (KeyError, ValueError):
+            return False
+
+
+class Battery(_SampledBattery, battery.Battery):
+    pass
+
+
+class BatteryIcon(_SampledBattery, battery.BatteryIcon):
+    pass
+
+
+class BatteryTotal(_SampledBattery, battery.Battery):
+    """
+        Charge and rate summed over all batteries.
+    """
+    def _get_info(self):
+        if self.sampler is None:
+            return False
+        total = None
+        for name in sorted(self.sampler.snapshot):
+            try:
+                info = self._info_from(self.sampler.snapshot[name])
+            except (KeyError, ValueError):
+                continue
+            if total is None:
+                total = info
+                continue
+            for key in ('now', 'full', 'power'):
+                total[key] += info[key]
+            if info['stat'] == 'Discharging' or (
+                    info['stat'] == 'Charging' and
+                    total['stat'] != 'Discharging'):
+                total['stat'] = info['stat']
+        return total if total is not None else False
@@ -0,0 +1,205 @@
+import os
+import json
+import time
+import shlex
+import asyncio
+import tempfile
+import subprocess
+
+from libqtile import bar
+from libqtile.widget import base
+from libqtile.log_utils import logger
+
+from .inotify import watcher
+
+CACHE = os.path.join(os.environ.get('XDG_CACHE_HOME') or
+                     os.path.expanduser('~/.cache'),
+                     'qtile', 'checkupdates.json')
+
+
+class CheckUpdates(base._TextBox):
+    """
+        Number of available updates. The check runs as a subprocess on
+        the event loop, every update_interval and shortly after the
+        local package database changed, i.e. after pacman installed or
+        removed something. The last result is kept in a cache file and
+        shown right away after a restart; a check only runs on startup
+        if it is due or the database changed since.
+    """
+    orientations = base.ORIENTATION_HORIZONTAL
+    defaults = [
+        ("command", ["checkupdates"],
+         "Command printing one line per available update"),
+        ("update_interval", 7200, "Seconds between two checks"),
+        ("timeout", 120, "Seconds before a check is killed"),
+        ("database", "/var/lib/pacman/local",
+         "Directory whose changes trigger a check"),
+        ("settle_delay", 10,
+         "Seconds without database changes before checking"),
+        ("cache_file", CACHE, "File the last result is kept in"),
+        ("display_format", "Updates: {updates}",
+         "Format of the text when updates are available"),
+        ("no_update_string", "", "Text when there are no updates"),
+        ("execute", None, "Command to run on click, check now if None"),
+        ("colour_no_updates", "ffffff", "Colour when there are no updates"),
+        ("colour_have_updates", "ffffff",
+         "Colour when updates are available"),
+    ]
+
+    def __init__(self, **config):
+        base._TextBox.__init__(self, "", width=bar.CALCULATED, **config)
+        self.add_defaults(CheckUpdates.defaults)
+        if isinstance(self.command, str):
+            self.command = shlex.split(self.command)
+        self.updates = None
+        # wall clock time of the last successful check
+        self.checked = 0.0
+        self.task = None
+        self.timer = None
+        self.settle_timer = None
+        self.watching = False
+        self.stale = False
+        self.stopped = False
+
+    def timer_setup(self):
+        self._load()
+        if self.updates is not None:
+            self._show()
+        try:
+            watcher.subscribe(self.qtile, self.database, None,
+                              self._database_changed)
+            self.watching = True
+        except OSError as e:
+            logger.warning('Cannot watch %s: %s', self.database, e)
+        if self._database_mtime() > self.checked:
+            self.check()
+        else:
+            self._schedule(self.checked + self.update_interval - time.time())
+
+    def finalize(self):
+        self.stopped = True
+        self._cancel_timers()
+        if self.task is not None:
+            self.task.cancel()
+        if self.watching:
+            watcher.unsubscribe(self.database, None, self._database_changed)
+            self.watching = False
+        base._TextBox.finalize(self)
+
+    def _database_mtime(self):
+        try:
+            return os.stat(self.database).st_mtime
+        except OSError:
+            return 0.0
+
+    def _load(self):
+        try:
+            with open(self.cache_file) as f:
+                cache = json.load(f)
+            self.updates = int(cache['updates'])
+            self.checked = float(cache['time'])
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning('Ignoring update cache %s: %s', self.cache_file, e)
+
+    def _save(self):
+        directory, name = os.path.split(self.cache_file)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(prefix=name, dir=directory)
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'updates': self.updates, 'time': self.checked}, f)
+            os.replace(tmp, self.cache_file)
+        except OSError as e:
+            logger.warning('Cannot write update cache %s: %s',
+                           self.cache_file, e)
+
+    def _cancel_timers(self):
+        for name in ('timer', 'settle_timer'):
+            timer = getattr(self, name)
+            if timer is not None:
+                timer.cancel()
+                setattr(self, name, None)
+
+    def _schedule(self, delay):
+        if self.timer is not None:
+            self.timer.cancel()
+        self.timer = self.timeout_add(max(delay, 0), self.check)
+
+    def _database_changed(self):
+        # pacman changes the database many times during a transaction,
+        # check once it is done
+        if self.settle_timer is not None:
+            self.settle_timer.cancel()
+        self.settle_timer = self.timeout_add(self.settle_delay, self._settled)
+
+    def _settled(self):
+        self.settle_timer = None
+        self.check()
+
+    def check(self):
+        """Check for updates now, unless a check is running"""
+        if self.task is not None:
+            # the database changed during the check, its result is stale
+            self.stale = True
+            return
+        self._cancel_timers()
+        self.task = self.qtile._eventloop.create_task(self._run())
+
+    async def _run(self):
+        try:
+            updates = await self._count()
+            if updates is not None:
+                self.updates = updates
+                self.checked = time.time()
+                self._save()
+                self._show()
+        finally:
+            self.task = None
+            if not self.stopped:
+                stale, self.stale = self.stale, False
+                self._schedule(0 if stale else self.update_interval)
+
+    async def _count(self):
+        """Run the command and return the number of lines it printed"""
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *self.command, stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL)
+        except OSError as e:
+            logger.warning('Cannot run %s: %s', self.command[0], e)
+            return None
+        try:
+            stdout, _ = await asyncio.wait_for(process.communicate(),
+                                               self.timeout)
+        except asyncio.TimeoutError:
+            logger.warning('%s did not finish within %ss',
+                           self.command[0], self.timeout)
+            return None
+        finally:
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+        # checkupdates exits with 2 if there are no updates
+        if process.returncode not in (0, 2):
+            logger.warning('%s failed with exit status %s',
+                           self.command[0], process.returncode)
+            return None
+        return len([line for line in stdout.splitlines() if line.strip()])
+
+    def _show(self):
+        if self.updates:
+            self.text = self.display_format.format(updates=self.updates)
+            self.layout.colour = self.colour_have_updates
+        else:
+            self.text = self.no_update_string
+            self.layout.colour = self.colour_no_updates
+        self.bar.draw()
+
+    def button_press(self, x, y, button):
+        if button == 1:
+            if self.execute:
+                self.qtile.cmd_spawn(self.execute)
+            else:
+                self.check()
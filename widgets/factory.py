@@ -0,0 +1,121 @@
+import time
+import importlib
+
+from libqtile.log_utils import logger
+
+# seconds the deferred widgets may take together before a warning is logged
+budget = 0.5
+
+# one entry per deferred widget: name, import, construct and configure time
+profile = []
+_report = None
+
+
+def _resolve(path):
+    """
+        Import the widget class for path, either the name of a widget in
+        this package, e.g. 'Mpd', or a dotted path like
+        'libqtile.widget.CheckUpdates'. Returns (class, import seconds).
+    """
+    module, _, name = path.rpartition('.')
+    if not module:
+        module = __package__
+    start = time.perf_counter()
+    cls = getattr(importlib.import_module(module), name)
+    return cls, time.perf_counter() - start
+
+
+def report():
+    global _report
+    _report = None
+    total = 0.0
+    for entry in profile:
+        total += entry['import'] + entry['construct'] + entry['configure']
+        logger.info('widget %(name)s: import %(import).1fms, construct '
+                    '%(construct).1fms, configure %(configure).1fms',
+                    dict((k, v * 1000 if isinstance(v, float) else v)
+                         for k, v in entry.items()))
+    if total > budget:
+        logger.warning('Deferred widgets took %.0fms to start, budget is '
+                       '%.0fms', total * 1000, budget * 1000)
+
+
+class WidgetFactory(object):
+    """
+        Stands in for a widget in a bar's widget list. The widget's module
+        is only imported and the widget only constructed when the bar is
+        configured, and the factory then replaces itself with it. The
+        time spent in each step is recorded in `profile` and logged once
+        all bars are configured.
+    """
+    def __init__(self, path, *args, **config):
+        self.path = path
+        self.args = args
+        self.config = config
+        self.name = config.get('name', path.rpartition('.')[2].lower())
+        # called with the widget once it is created
+        self.created = []
+        self.widget = None
+        self.import_time = self.construct_time = 0.0
+
+    def _create(self):
+        if self.widget is None:
+            cls, self.import_time = _resolve(self.path)
+            start = time.perf_counter()
+            self.widget = cls(*self.args, **self.config)
+            self.construct_time = time.perf_counter() - start
+            for callback in self.created:
+                callback(self.widget)
+        return self.widget
+
+    # the bar checks these on all widgets before configuring the first
+    def _test_orientation_compatibility(self, horizontal):
+        self._create()._test_orientation_compatibility(horizontal)
+
+    @property
+    def length_type(self):
+        return self._create().length_type
+
+    def _configure(self, qtile, bar):
+        global _report
+        widget = self._create()
+        bar.widgets[bar.widgets.index(self)] = widget
+        if qtile.widgetMap.get(self.name) is self:
+            qtile.widgetMap[self.name] = widget
+
+        start = time.perf_counter()
+        widget._configure(qtile, bar)
+        profile.append({
+            'name': self.name,
+            'import': self.import_time,
+            'construct': self.construct_time,
+            'configure': time.perf_counter() - start,
+        })
+        if _report is None:
+            # runs after every bar has configured its widgets
+            _report = qtile.call_soon(report)
+
+
+def defer(path, *args, **config):
+    """Return a factory that creates the widget when its bar is configured"""
+    return WidgetFactory(path, *args, **config)
+
+
+def call(path):
+    """
+        Return a function for lazy.function() that imports path, e.g.
+        'volume.mixer.raise_volume' from this package, on the first call
+        instead of when the key bindings are defined.
+    """
+    module, _, attrs = path.partition('.')
+    target = []
+
+    def function(qtile, *args, **kwargs):
+        if not target:
+            obj = importlib.import_module('.' + module, __package__)
+            for attr in attrs.split('.'):
+                obj = getattr(obj, attr)
+            target.append(obj)
+        return target[0](qtile, *args, **kwargs)
+    function.__name__ = path.rpartition('.')[2]
+    return function
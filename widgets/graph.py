@@ -0,0 +1,281 @@
+import math
+import collections
+from array import array
+
+import cairocffi
+from libqtile.widget import base
+
+from .procstat import get_sampler
+from .snapshot import snapshot
+
+
+class _Graph(base._Widget):
+    """
+        A graph that keeps its samples in a fixed size ring buffer and
+        scrolls the already drawn pixels instead of redrawing everything:
+        a new sample costs one blit and drawing the newly exposed columns,
+        independent of samples and width. Everything is redrawn only when
+        the scale or the size changes.
+
+        Subclasses set `source` and implement sample() to push() a value
+        from the shared /proc sampler.
+    """
+    orientations = base.ORIENTATION_HORIZONTAL
+    fixed_upper_bound = False
+    source = None
+    defaults = [
+        ("graph_color", "18BAEB", "Graph color"),
+        ("fill_color", "1667EB.3", "Fill color for linefill graph"),
+        ("border_color", "215578", "Widget border color"),
+        ("border_width", 2, "Widget border width"),
+        ("margin_x", 3, "Margin X"),
+        ("margin_y", 3, "Margin Y"),
+        ("samples", 100, "Count of graph samples."),
+        ("frequency", 1, "Update frequency in seconds"),
+        ("type", "linefill", "'box', 'line', 'linefill'"),
+        ("line_width", 3, "Line width"),
+        ("start_pos", "bottom", "Drawer starting position ('bottom'/'top')"),
+    ]
+
+    def __init__(self, width=100, **config):
+        base._Widget.__init__(self, width, **config)
+        self.add_defaults(_Graph.defaults)
+        self.values = array('d', [0.0]) * self.samples
+        # number of samples pushed so far, the ring index is count % samples
+        self.count = self.samples
+        # candidates for the maximum of the window: (index, value) pairs
+        # with decreasing values, so the maximum is always the first one
+        self.window_max = collections.deque()
+        self.maxvalue = 0
+        self.scale = None
+        self.geometry = None
+        self.sampler = None
+
+    def timer_setup(self):
+        # keep the history across restarts, the bar has already drawn
+        # the empty graph by now
+        history = snapshot.restore(self.snapshot_key())
+        if history:
+            for value in history:
+                self.append(value)
+            self.geometry = None
+            self.draw()
+        self.sampler = get_sampler(self.qtile, self.frequency)
+        self.sampler.subscribe(self, self.source)
+
+    def finalize(self):
+        snapshot.save(self.snapshot_key(), [
+            self.values[index % self.samples]
+            for index in range(self.count - self.samples, self.count)])
+        if self.sampler is not None:
+            self.sampler.unsubscribe(self, self.source)
+        base._Widget.finalize(self)
+
+    def snapshot_key(self):
+        return 'graph %s' % self.source
+
+    @property
+    def graphwidth(self):
+        return self.width - self.border_width * 2 - self.margin_x * 2
+
+    @property
+    def graphheight(self):
+        return self.bar.height - self.margin_y * 2 - self.border_width * 2
+
+    def _scale(self):
+        """
+            The value drawn at full height. Without a fixed upper bound it
+            follows the maximum in steps of 2**(1/4), so small changes of
+            the maximum don't force a full redraw.
+        """
+        if self.fixed_upper_bound or self.maxvalue <= 0:
+            return self.maxvalue or 1
+        return 2 ** (math.ceil(math.log2(self.maxvalue) * 4) / 4)
+
+    def append(self, value):
+        """Add a sample without drawing it"""
+        index = self.count
+        self.values[index % self.samples] = value
+        self.count += 1
+        if not self.fixed_upper_bound:
+            window_max = self.window_max
+            while window_max and window_max[-1][1] <= value:
+                window_max.pop()
+            window_max.append((index, value))
+            if window_max[0][0] <= index - self.samples:
+                window_max.popleft()
+            self.maxvalue = window_max[0][1]
+
+    def push(self, value):
+        self.append(value)
+        if self.configured:
+            self.draw_incremental()
+
+    def _x(self, index):
+        """Left edge of a sample, kept in absolute coordinates so that
+        scrolling by whole pixels never accumulates rounding errors"""
+        first = self.count - self.samples
+        return (self.graph_x + round(index * self.step) -
+                round(first * self.step))
+
+    def _height(self, value):
+        return min(value / self.scale, 1.0) * self.graphheight
+
+    def _y(self, value):
+        if self.start_pos == 'bottom':
+            return self.graph_y + self.graphheight - self._height(value)
+        return self.graph_y + self._height(value)
+
+    def _baseline(self):
+        if self.start_pos == 'bottom':
+            return self.graph_y + self.graphheight
+        return self.graph_y
+
+    def _draw_samples(self, start):
+        """Draw the samples from index start to the newest one"""
+        ctx = self.drawer.ctx
+        values = self.values
+        samples = self.samples
+        end = self.count
+        if self.type == 'box':
+            self.drawer.set_source_rgb(self.graph_color)
+            baseline = self._baseline()
+            for index in range(start, end):
+                x = self._x(index)
+                y = self._y(values[index % samples])
+                ctx.rectangle(x, min(y, baseline), self._x(index + 1) - x,
+                              abs(baseline - y))
+            ctx.fill()
+            return
+
+        ctx.set_line_width(self.line_width)
+        ctx.set_line_join(cairocffi.LINE_JOIN_ROUND)
+        ctx.set_line_cap(cairocffi.LINE_CAP_ROUND)
+        ctx.move_to(self._x(start), self._y(values[start % samples]))
+        for index in range(start + 1, end):
+            ctx.line_to(self._x(index), self._y(values[index % samples]))
+        # the newest sample extends to the right edge
+        ctx.line_to(self._x(end), self._y(values[(end - 1) % samples]))
+        if self.type == 'linefill':
+            path = ctx.copy_path()
+            ctx.line_to(self._x(end), self._baseline())
+            ctx.line_to(self._x(start), self._baseline())
+            ctx.close_path()
+            self.drawer.set_source_rgb(self.fill_color)
+            ctx.fill()
+            ctx.append_path(path)
+        self.drawer.set_source_rgb(self.graph_color)
+        ctx.stroke()
+
+    def _clip_graph(self, x, width):
+        ctx = self.drawer.ctx
+        ctx.save()
+        ctx.rectangle(x, self.graph_y, width, self.graphheight)
+        ctx.clip()
+
+    def draw_full(self):
+        self.geometry = (self.width, self.bar.height)
+        self.graph_x = self.margin_x + self.border_width
+        self.graph_y = self.margin_y + self.border_width
+        self.step = self.graphwidth / float(self.samples)
+        self.scale = self._scale()
+
+        ctx = self.drawer.ctx
+        self.drawer.clear(self.background or self.bar.background)
+        if self.border_width:
+            self.drawer.set_source_rgb(self.border_color)
+            ctx.set_line_width(self.border_width)
+            ctx.rectangle(self.margin_x, self.margin_y,
+                          self.graphwidth + self.border_width * 2,
+                          self.bar.height - self.margin_y * 2)
+            ctx.stroke()
+        self._clip_graph(self.graph_x, self.graphwidth)
+        self._draw_samples(self.count - self.samples)
+        ctx.restore()
+
+    def draw_incremental(self):
+        """Scroll the graph by one sample and draw only the new part"""
+        if self._needs_full_draw():
+            self.draw()
+            return
+        ctx = self.drawer.ctx
+        right = self.graph_x + self.graphwidth
+        newest = self.count - 1
+        first = self.count - self.samples
+        dx = round(first * self.step) - round((first - 1) * self.step)
+
+        # move what is already drawn to the left
+        self._clip_graph(self.graph_x, self.graphwidth - dx)
+        ctx.set_source_surface(self.drawer.surface, -dx, 0)
+        ctx.set_operator(cairocffi.OPERATOR_SOURCE)
+        ctx.paint()
+        ctx.restore()
+
+        # lines connect to the previous sample, so redraw from there
+        start = newest if self.type == 'box' else newest - 1
+        x = self._x(start)
+        self._clip_graph(x, right - x)
+        self.drawer.set_source_rgb(self.background or self.bar.background)
+        ctx.paint()
+        self._draw_samples(max(start - 1, self.count - self.samples))
+        ctx.restore()
+        self.drawer.draw(offsetx=self.offset, width=self.width)
+
+    def _needs_full_draw(self):
+        return (self.geometry != (self.width, self.bar.height) or
+                self.scale != self._scale())
+
+    def draw(self):
+        # the widget has its own drawer, so when the bar redraws for
+        # another widget the pixels from the last push are still valid
+        if self._needs_full_draw():
+            self.draw_full()
+        self.drawer.draw(offsetx=self.offset, width=self.width)
+
+
+class CPUGraph(_Graph):
+    """
+        Graph of the cpu load in percent, from the shared /proc sampler.
+    """
+    fixed_upper_bound = True
+    source = 'cpu'
+    defaults = [
+        ("core", "all", "Which core to show (all/0/1/2/...)"),
+    ]
+
+    def __init__(self, **config):
+        _Graph.__init__(self, **config)
+        self.add_defaults(CPUGraph.defaults)
+        self.maxvalue = 100
+
+    def snapshot_key(self):
+        return 'graph cpu %s' % self.core
+
+    def sample(self, values):
+        if self.core == 'all':
+            self.push(values['cpu'])
+        else:
+            self.push(values.get('cpu%s' % self.core, 0))
+
+
+class NetGraph(_Graph):
+    """
+        Graph of the traffic of a network interface in bytes per second,
+        from the shared /proc sampler.
+    """
+    source = 'net'
+    defaults = [
+        ("interface", "eth0", "Interface to display info for"),
+        ("bandwidth_type", "down", "down(load)/up(load)"),
+    ]
+
+    def __init__(self, **config):
+        _Graph.__init__(self, **config)
+        self.add_defaults(NetGraph.defaults)
+
+    def snapshot_key(self):
+        return 'graph %s %s' % (self.interface, self.bandwidth_type)
+
+    def sample(self, values):
+        rx, tx = values.get(self.interface, (0, 0))
+        self.push(rx if self.bandwidth_type == 'down' else tx)
@@ -0,0 +1,172 @@
+import os
+import ctypes
+import ctypes.util
+import struct
+
+from libqtile.log_utils import logger
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+
+IN_CLOEXEC = os.O_CLOEXEC
+IN_NONBLOCK = os.O_NONBLOCK
+
+# everything that can change the mtime of, or replace, a file in a directory
+FILE_CHANGES = (IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+                IN_CREATE | IN_DELETE)
+
+_event = struct.Struct('iIII')
+_libc = None
+
+
+def _load_libc():
+    global _libc
+    if _libc is None:
+        _libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+    return _libc
+
+
+def _check(ret):
+    if ret < 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, os.strerror(errno))
+    return ret
+
+
+class Inotify(object):
+    """
+        Minimal ctypes binding for the inotify API. The fd is non-blocking
+        and meant to be added as a reader to the event loop.
+    """
+    def __init__(self):
+        self.libc = _load_libc()
+        self.fd = _check(self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC))
+
+    def fileno(self):
+        return self.fd
+
+    def add_watch(self, path, mask):
+        return _check(self.libc.inotify_add_watch(
+            self.fd, os.fsencode(path), ctypes.c_uint32(mask)))
+
+    def rm_watch(self, wd):
+        return _check(self.libc.inotify_rm_watch(self.fd, wd))
+
+    def read_events(self):
+        """Return all pending events as (wd, mask, cookie, name) tuples"""
+        events = []
+        while True:
+            try:
+                buf = os.read(self.fd, 4096)
+            except BlockingIOError:
+                return events
+            offset = 0
+            while offset < len(buf):
+                wd, mask, cookie, length = _event.unpack_from(buf, offset)
+                offset += _event.size
+                name = buf[offset:offset + length].rstrip(b'\0')
+                offset += length
+                events.append((wd, mask, cookie, os.fsdecode(name)))
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class Watcher(object):
+    """
+        Process wide registry of file watches. All subscriptions share a
+        single inotify fd that is read from qtile's event loop; there is
+        one watch per directory and events are dispatched by file name.
+    """
+    def __init__(self):
+        self.inotify = None
+        self.loop = None
+        self.watches = {}
+        self.subscribers = {}
+
+    def subscribe(self, qtile, directory, name, callback):
+        """
+            Call callback() in the event loop whenever the entry name in
+            directory changes. A name of None subscribes to every entry.
+            Raises OSError if the directory can't be watched.
+        """
+        if self.inotify is None:
+            self.inotify = Inotify()
+            self.loop = qtile._eventloop
+            self.loop.add_reader(self.inotify.fileno(), self._on_events)
+        wd = self.watches.get(directory)
+        if wd is None:
+            try:
+                wd = self.inotify.add_watch(directory,
+                                            FILE_CHANGES | IN_ONLYDIR)
+            except OSError:
+                self._maybe_close()
+                raise
+            self.watches[directory] = wd
+            self.subscribers[wd] = {}
+        self.subscribers[wd].setdefault(name, []).append(callback)
+
+    def unsubscribe(self, directory, name, callback):
+        wd = self.watches.get(directory)
+        if wd is None:
+            return
+        names = self.subscribers[wd]
+        callbacks = names.get(name, [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+        if not callbacks:
+            names.pop(name, None)
+        if not names:
+            del self.watches[directory]
+            del self.subscribers[wd]
+            try:
+                self.inotify.rm_watch(wd)
+            except OSError:
+                # the directory is already gone
+                pass
+        self._maybe_close()
+
+    def _maybe_close(self):
+        if not self.watches and self.inotify is not None:
+            self.loop.remove_reader(self.inotify.fileno())
+            self.inotify.close()
+            self.inotify = None
+
+    def _on_events(self):
+        changed = []
+        for wd, mask, cookie, name in self.inotify.read_events():
+            if mask & IN_Q_OVERFLOW:
+                # events were lost, let everyone check again
+                for names in self.subscribers.values():
+                    for callbacks in names.values():
+                        changed.extend(callbacks)
+                continue
+            names = self.subscribers.get(wd)
+            if names is None:
+                continue
+            changed.extend(names.get(name, ()))
+            changed.extend(names.get(None, ()))
+        # a burst of events for one file results in a single callback
+        seen = set()
+        for callback in changed:
+            if callback not in seen:
+                seen.add(callback)
+                try:
+                    callback()
+                except Exception:
+                    logger.exception('Error in inotify callback')
+
+
+watcher = Watcher()
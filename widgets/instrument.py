@@ -0,0 +1,133 @@
+import time
+import threading
+from array import array
+
+from libqtile.log_utils import logger
+
+from .factory import WidgetFactory
+
+# what is timed, if the widget has it
+METHODS = ('poll', 'tick', 'update', 'refresh', 'render', 'sample',
+           'calculate_length', 'draw', 'draw_incremental', 'button_press')
+
+# seconds a call may block the event loop before it is flagged
+threshold = 0.010
+# seconds between two warnings about the same widget
+warn_interval = 60
+
+
+class Stats(object):
+    """
+        Call statistics of one widget: per method the number of calls and
+        the cumulative, maximum and event loop time, plus the last `size`
+        calls in a ring buffer of preallocated arrays, so recording a
+        call doesn't allocate.
+    """
+    def __init__(self, name, size=256):
+        self.name = name
+        self.size = size
+        # method -> [calls, total, max, on the event loop]
+        self.methods = {}
+        self.count = 0
+        self.ends = array('d', [0.0]) * size
+        self.durations = array('d', [0.0]) * size
+        self.names = [None] * size
+        self.blocked = 0
+        self.warned = 0.0
+
+    def record(self, method, end, duration, on_loop):
+        stats = self.methods[method]
+        stats[0] += 1
+        stats[1] += duration
+        if duration > stats[2]:
+            stats[2] = duration
+        index = self.count % self.size
+        self.count += 1
+        self.ends[index] = end
+        self.durations[index] = duration
+        self.names[index] = method
+        if on_loop:
+            stats[3] += duration
+            if duration > threshold:
+                self.blocked += 1
+                if end - self.warned > warn_interval:
+                    self.warned = end
+                    logger.warning('Widget %s blocked the event loop in %s '
+                                   'for %.1fms', self.name, method,
+                                   duration * 1000)
+
+    def report(self):
+        """
+            Calls, total, max and event loop time in ms per method, the
+            number of calls that blocked the loop longer than the
+            threshold and the slowest of the recent calls.
+        """
+        now = time.perf_counter()
+        recent = []
+        for index in range(max(self.count - self.size, 0), self.count):
+            index %= self.size
+            recent.append((self.durations[index], self.names[index],
+                           self.ends[index]))
+        recent.sort(reverse=True)
+        return {
+            'methods': dict(
+                (method, {'calls': calls, 'total_ms': total * 1000,
+                          'max_ms': longest * 1000, 'loop_ms': loop * 1000})
+                for method, (calls, total, longest, loop)
+                in self.methods.items()),
+            'blocked': self.blocked,
+            'threshold_ms': threshold * 1000,
+            'slowest_recent': [
+                {'method': method, 'ms': duration * 1000,
+                 'seconds_ago': now - end}
+                for duration, method, end in recent[:10]],
+        }
+
+    def reset(self):
+        """Forget everything recorded so far"""
+        for stats in self.methods.values():
+            stats[:] = [0, 0.0, 0.0, 0.0]
+        self.count = 0
+        self.blocked = 0
+
+
+def _wrap(stats, method, func, loop_thread):
+    clock = time.perf_counter
+    get_ident = threading.get_ident
+
+    def timed(*args, **kwargs):
+        start = clock()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            end = clock()
+            stats.record(method, end, end - start, get_ident() == loop_thread)
+    timed.__name__ = func.__name__
+    timed.__doc__ = func.__doc__
+    return timed
+
+
+def watch(widget, methods=METHODS):
+    """
+        Time the hot methods of widget, or of the widget a factory from
+        defer() creates, and add the profile and profile_reset commands:
+
+            qtile cmd-obj -o widget mpd -f profile
+
+        Must be called from the thread running the event loop, i.e. from
+        the config.
+    """
+    if isinstance(widget, WidgetFactory):
+        widget.created.append(lambda created: watch(created, methods))
+        return widget
+    stats = Stats(widget.name)
+    loop_thread = threading.get_ident()
+    for method in methods:
+        func = getattr(widget, method, None)
+        if func is None:
+            continue
+        stats.methods[method] = [0, 0.0, 0.0, 0.0]
+        setattr(widget, method, _wrap(stats, method, func, loop_thread))
+    widget.cmd_profile = stats.report
+    widget.cmd_profile_reset = stats.reset
+    return widget
@@ -0,0 +1,227 @@
+import os
+import re
+import json
+import time
+import heapq
+import bisect
+import tempfile
+
+from libqtile.widget import prompt
+from libqtile.log_utils import logger
+
+CACHE = os.path.join(os.environ.get('XDG_CACHE_HOME') or
+                     os.path.expanduser('~/.cache'), 'qtile')
+INDEX = os.path.join(CACHE, 'launcher.json')
+USAGE = os.path.join(CACHE, 'launcher-usage.json')
+
+
+def list_executables(directory):
+    names = []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_file() and entry.stat().st_mode & 0o111:
+                        names.append(entry.name)
+                except OSError:
+                    # dangling symlink
+                    continue
+    except OSError:
+        pass
+    return names
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as e:
+        logger.warning('Ignoring launcher cache %s: %s', path, e)
+    return {}
+
+
+def _write_json(path, data):
+    directory, name = os.path.split(path)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=name, dir=directory)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(tmp, path)
+    except OSError as e:
+        logger.warning('Cannot write launcher cache %s: %s', path, e)
+
+
+class ExecutableIndex(object):
+    """
+        Sorted names of the executables in $PATH, kept in a cache file.
+        How often and when each command was launched is kept in a small
+        file of its own, so a launch does not rewrite the index.
+        refresh() only stats the PATH directories and lists the ones
+        whose mtime changed, so it is cheap enough to run every time the
+        launcher opens. Directories that do not exist are cached too.
+
+        Matches are ranked by usage, halving every half_life seconds:
+        prefix matches first, then commands containing the typed
+        characters in order.
+    """
+    half_life = 30 * 24 * 60 * 60
+
+    def __init__(self, path=INDEX, usage_path=USAGE):
+        self.path = path
+        self.usage_path = usage_path
+        self.loaded = False
+        # directory -> [mtime or None if missing, names separated by
+        # newlines]
+        self.dirs = {}
+        # name -> [launches, last launch]
+        self.usage = {}
+        self.names = []
+        self.blob = ''
+
+    def _load(self):
+        self.loaded = True
+        dirs = _read_json(self.path)
+        usage = _read_json(self.usage_path)
+        if isinstance(dirs, dict) and isinstance(dirs.get('dirs'), dict):
+            self.dirs = dirs['dirs']
+        if isinstance(usage, dict):
+            self.usage = usage
+
+    def save(self):
+        _write_json(self.path, {'dirs': self.dirs})
+
+    def save_usage(self):
+        _write_json(self.usage_path, self.usage)
+
+    def refresh(self):
+        if not self.loaded:
+            self._load()
+        path = os.environ.get('PATH', prompt.CommandCompleter.DEFAULTPATH)
+        directories = []
+        for directory in path.split(':'):
+            directory = os.path.expanduser(directory)
+            if directory and directory not in directories:
+                directories.append(directory)
+        changed = set(self.dirs) != set(directories)
+        dirs = {}
+        for directory in directories:
+            try:
+                mtime = os.stat(directory).st_mtime
+            except OSError:
+                mtime = None
+            cached = self.dirs.get(directory)
+            if cached is None or cached[0] != mtime:
+                names = [] if mtime is None else list_executables(directory)
+                cached = [mtime, '\n'.join(names)]
+                changed = True
+            dirs[directory] = cached
+        if changed or not self.names:
+            self.dirs = dirs
+            self.names = sorted(set(
+                name for _, names in dirs.values()
+                for name in names.split('\n') if name))
+            self.blob = '\n'.join(self.names)
+            if changed:
+                self.save()
+
+    def score(self, name, now):
+        usage = self.usage.get(name)
+        if usage is None:
+            return 0.0
+        return usage[0] * 0.5 ** ((now - usage[1]) / self.half_life)
+
+    def used(self, name):
+        usage = self.usage.setdefault(name, [0, 0.0])
+        now = time.time()
+        # fold the old launches into the count with their decay
+        usage[0] = self.score(name, now) + 1
+        usage[1] = now
+        self.save_usage()
+
+    def _exists(self, name):
+        i = bisect.bisect_left(self.names, name)
+        return i < len(self.names) and self.names[i] == name
+
+    def _rank(self, matches, used, now, limit):
+        """
+            Used commands by score, then the shortest unused ones. Only
+            the few used commands need a score, the rest is a partial
+            sort by length, alphabetical on ties as matches are sorted.
+        """
+        used.sort(key=lambda name: (-self.score(name, now), len(name), name))
+        seen = set(used)
+        return used + [name for name in heapq.nsmallest(
+            limit + len(used), matches, key=len) if name not in seen]
+
+    def search(self, text, limit=100):
+        """Commands matching text, best first"""
+        now = time.time()
+        start = bisect.bisect_left(self.names, text)
+        end = bisect.bisect_left(self.names, text + '\uffff', start)
+        used = [name for name in self.usage
+                if name.startswith(text) and self._exists(name)]
+        result = self._rank(self.names[start:end], used, now, limit)
+        if len(text) > 1 and len(result) < limit:
+            # one regex over all names is a single scan in C, matching up
+            # to the first occurrence of each character never backtracks
+            pattern = re.compile('^' + ''.join(
+                '[^\n%s]*%s' % (re.escape(c), re.escape(c)) for c in text) +
+                '[^\n]*', re.M)
+            fuzzy = [m.group() for m in pattern.finditer(self.blob)
+                     if not m.group().startswith(text)]
+            used = [name for name in self.usage
+                    if not name.startswith(text) and pattern.match(name) and
+                    self._exists(name)]
+            result += self._rank(fuzzy, used, now, limit - len(result))
+        return result[:limit]
+
+
+index = ExecutableIndex()
+
+
+class FastCommandCompleter(prompt.CommandCompleter):
+    """
+        Completes commands from the shared index instead of globbing all
+        of $PATH on every Tab. Paths are still completed from the file
+        system.
+    """
+    def __init__(self, qtile, _testing=False):
+        prompt.CommandCompleter.__init__(self, qtile, _testing)
+        index.refresh()
+
+    def complete(self, txt):
+        if txt and txt[0] in "~/":
+            return prompt.CommandCompleter.complete(self, txt)
+        if not self.lookup:
+            self.lookup = [(name, name) for name in index.search(txt)]
+            self.lookup.append((txt, txt))
+            self.offset = -1
+        self.offset += 1
+        if self.offset >= len(self.lookup):
+            self.offset = 0
+        display, self.thisfinal = self.lookup[self.offset]
+        return display
+
+
+class Launcher(prompt.Prompt):
+    """
+        Prompt whose command completion uses the executable index. Open
+        it with launch(), which also records what was launched for the
+        ranking.
+    """
+    completers = dict(prompt.Prompt.completers, cmd=FastCommandCompleter)
+
+
+def launch(qtile, widget='prompt', command='%s'):
+    """For lazy.function(), like lazy.spawncmd() but counts launches"""
+    def spawn(args):
+        if args:
+            index.used(args.split()[0])
+            qtile.cmd_spawn(command % args)
+    try:
+        qtile.widgetMap[widget].startInput('spawn', spawn, 'cmd')
+    except KeyError:
+        logger.error("No widget named '%s' present.", widget)
@@ -0,0 +1,42 @@
+from libqtile.widget import base
+
+from .procstat import get_sampler
+
+
+class Memory(base.InLoopPollText):
+    """
+        Memory usage from the shared /proc sampler. The values for fmt
+        are the fields of /proc/meminfo in MB, plus MemUsed.
+    """
+    orientations = base.ORIENTATION_HORIZONTAL
+    defaults = [
+        ("fmt", "{MemUsed}M/{MemTotal}M", "see /proc/meminfo for field names"),
+        ("update_interval", 1.0, "Update interval in seconds"),
+    ]
+
+    def __init__(self, **config):
+        base.InLoopPollText.__init__(self, **config)
+        self.add_defaults(Memory.defaults)
+        self.sampler = None
+        self.meminfo = None
+
+    def timer_setup(self):
+        self.sampler = get_sampler(self.qtile, self.update_interval)
+        self.sampler.subscribe(self, 'memory')
+
+    def finalize(self):
+        if self.sampler is not None:
+            self.sampler.unsubscribe(self, 'memory')
+        base.InLoopPollText.finalize(self)
+
+    def sample(self, meminfo):
+        self.meminfo = meminfo
+        self.tick()
+
+    def poll(self):
+        if self.meminfo is None:
+            return 'N/A'
+        values = dict((k, v // 1024) for k, v in self.meminfo.items())
+        values['MemUsed'] = (values['MemTotal'] - values['MemFree'] -
+                             values['Buffers'] - values['Cached'])
+        return self.fmt.format(**values)
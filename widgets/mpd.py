@@ -35,19 +35,46 @@
 
 import re
 import os
-
-import mpd
-import select
+import time
 
 from libqtile import utils, pangocffi
 from libqtile.widget import base
 from libqtile.log_utils import logger
 
+from .mpdsession import get_session
+from .snapshot import snapshot
+
 
 def truncate(s):
     return (s[:25] + '…') if len(s) > 25 else s
 
 
+def nil(widget):
+    return "(nil)"
+
+
+def guarded(getter):
+    """Getters raise KeyError for missing tags, show (nil) instead"""
+    def get(widget):
+        try:
+            return getter(widget)
+        except KeyError:
+            return "(nil)"
+    return get
+
+
+def memoized(fmt, getter):
+    """Cache the result of a song getter until the song changes"""
+    getter = guarded(getter)
+
+    def get(widget):
+        cache = widget.song_cache
+        if fmt not in cache:
+            cache[fmt] = getter(widget)
+        return cache[fmt]
+    return get
+
+
 class Mpd(base.ThreadPoolText):
 
     """
@@ -59,6 +86,13 @@ class Mpd(base.ThreadPoolText):
         ("foreground", "909090", "Foreground progress colour"),
         ("pause_progress_color", "#a0a0a0", "Font color on pause"),
         ("pause_color", "#505050", "Font color on pause"),
+        ("volume_delay", 0.05,
+         "Seconds to collect wheel events before sending one setvol"),
+        ("connect_timeout", 2.0, "Timeout in seconds for connecting to mpd"),
+        ("max_failures", 5,
+         "Failed connects in a row before reconnecting is paused"),
+        ("reconnect_cooldown", 300.0,
+         "Seconds to pause reconnecting after max_failures"),
     ]
 
     # TODO: have this use our config framework
@@ -88,49 +122,72 @@ class Mpd(base.ThreadPoolText):
         self.port = port
         self.password = password
         self.fmt_playing, self.fmt_stopped = fmt_playing, fmt_stopped
+        self.templates = {}
+        self.song_cache = {}
+        self.song_serial = 0
+        self.shows_elapsed = '%e' in self.compile_format(fmt_playing)
+        self.compile_format(fmt_stopped)
         self.msg_nc = msg_nc
         self.do_color_progress = do_color_progress
         self.do_color_pause = do_color_pause
         self.inc = 2
         self.add_defaults(Mpd.defaults)
-        self.client = mpd.MPDClient()
-        self.connected = False
-        self.first_poll = True
+        self.session = None
+        self.status = {}
+        self.song = {}
         self.stop = False
+        # position at the last status, extrapolated locally while playing
+        self.elapsed_at = 0.0
+        self.elapsed_base = 0.0
+        self.duration = 0.0
+        self.text_length = 0
+        self.progress_timer = None
+        self.volume = -1
+        self.volume_pending = 0
+        self.volume_timer = None
+        # everything the rendered markup depends on, see _render_key()
+        self.render_key = None
+        self.redraws_skipped = 0
+
+    def timer_setup(self):
+        state = snapshot.restore(self._snapshot_key())
+        if state is not None:
+            # show what was playing before a restart until mpd answers
+            elapsed = state['elapsed']
+            if state['status'].get('state') == 'play':
+                elapsed += max(time.time() - state['time'], 0)
+            self.refresh(state['status'], state['song'], elapsed)
+        # updates are pushed by the shared idle session instead of polled
+        if self.session is None:
+            self.session = get_session(
+                self.host, self.port, self.password,
+                connect_timeout=self.connect_timeout,
+                max_failures=self.max_failures,
+                reconnect_cooldown=self.reconnect_cooldown)
+            self.session.subscribe(self)
 
     def finalize(self):
+        if self.status:
+            snapshot.save(self._snapshot_key(), {
+                'status': self.status,
+                'song': self.song,
+                'elapsed': self.elapsed(),
+                'time': time.time(),
+            })
         self.stop = True
-
-        if self.connected:
-            try:
-                self.client.disconnect()
-            except mpd.ConnectionError:
-                pass
+        self._cancel_progress()
+        if self.volume_timer is not None:
+            self.volume_timer.cancel()
+        if self.session is not None:
+            self.session.unsubscribe(self)
         base._Widget.finalize(self)
 
-    def connect(self, quiet=False):
-        if self.connected:
-            return True
+    def _snapshot_key(self):
+        return 'mpd %s:%s' % (self.host, self.port)
 
-        try:
-            self.client.connect(host=self.host, port=self.port)
-        except Exception:
-            if not quiet:
-                logger.exception('Failed to connect to mpd')
-            return False
-
-        if self.password:
-            try:
-                self.client.password(self.password)
-            except Exception:
-                logger.warning('Authentication failed.  Disconnecting')
-                try:
-                    self.client.disconnect()
-                except Exception:
-                    pass
-
-        self.connected = True
-        return True
+    def command(self, name, *args):
+        if self.session is not None:
+            self.qtile.run_in_executor(self.session.command, name, *args)
 
     def _configure(self, qtile, bar):
         super(Mpd, self)._configure(qtile, bar)
@@ -167,8 +224,7 @@ class Mpd(base.ThreadPoolText):
         return truncate(self.song['album'])
 
     def get_elapsed(self):
-        elapsed = self.status['time'].split(':')[0]
-        return self.to_minutes_seconds(elapsed)
+        return self.to_minutes_seconds(self.elapsed())
 
     def get_file(self):
         return self.song['file']
@@ -248,26 +304,113 @@ class Mpd(base.ThreadPoolText):
         '1': get_single,
         'r': get_repeat,
         'h': get_shuffle,
-        '%': lambda x: '%',
     }
 
-    def match_check(self, m):
-        try:
-            return self.formats[m.group(1)](self)
-        except KeyError:
-            return "(nil)"
+    # only depend on the current song and are cached per song id
+    song_formats = 'aAfltT'
+
+    def compile_format(self, string):
+        """
+            Split a format string into literal strings and getter
+            functions once, so formatting is a single join per update.
+            Returns the set of %-codes used by the template.
+        """
+        template = []
+        used = set()
+        literal = ''
+        for i, part in enumerate(re.split("(%.)", string)):
+            if i % 2 == 0:
+                literal += part
+                continue
+            fmt = part[1]
+            if fmt == '%':
+                literal += '%'
+                continue
+            if literal:
+                template.append(literal)
+                literal = ''
+            used.add(part)
+            getter = self.formats.get(fmt)
+            if getter is None:
+                template.append(nil)
+            elif fmt in self.song_formats:
+                template.append(memoized(fmt, getter))
+            else:
+                template.append(guarded(getter))
+        if literal:
+            template.append(literal)
+        self.templates[string] = template
+        return used
 
     def do_format(self, string):
-        return re.sub("%(.)", self.match_check, string)
+        template = self.templates.get(string)
+        if template is None:
+            self.compile_format(string)
+            template = self.templates[string]
+        return ''.join([part if part.__class__ is str else part(self)
+                        for part in template])
+
+    def _sync_elapsed(self):
+        """Remember the position mpd reported and when we got it"""
+        self.elapsed_at = time.monotonic()
+        self.elapsed_base = self.duration = 0.0
+        if 'time' in self.status:
+            elapsed, total = self.status['time'].split(':')
+            self.elapsed_base = float(self.status.get('elapsed', elapsed))
+            self.duration = float(total)
+
+    def elapsed(self):
+        """Current position in seconds, extrapolated from the last status"""
+        if self.status.get('state') != 'play':
+            return self.elapsed_base
+        elapsed = self.elapsed_base + time.monotonic() - self.elapsed_at
+        if self.duration:
+            return min(elapsed, self.duration)
+        return elapsed
+
+    def _cancel_progress(self):
+        if self.progress_timer is not None:
+            self.progress_timer.cancel()
+            self.progress_timer = None
+
+    def _schedule_progress(self):
+        """
+            Arm a timer for the next moment the rendered text changes:
+            either the progress colour moves by one character or, when
+            the format shows it, the elapsed time ticks over a second.
+        """
+        self._cancel_progress()
+        if self.status.get('state') != 'play' or not self.duration:
+            return
+        elapsed = self.elapsed()
+        delays = []
+        if self.do_color_progress and self.text_length:
+            per_char = self.duration / self.text_length
+            delays.append(per_char * (int(elapsed / per_char) + 1) - elapsed)
+        if self.shows_elapsed:
+            delays.append(1.0 - elapsed % 1.0)
+        if delays:
+            self.progress_timer = self.timeout_add(
+                min(delays) + 0.01, self._progress_tick)
+
+    def _progress_tick(self):
+        self.progress_timer = None
+        if self.stop or not self.status:
+            return
+        self.render()
+        self._schedule_progress()
+
+    def _progress_index(self, elapsed, length):
+        if self.do_color_progress and self.duration:
+            return int(elapsed / self.duration * length)
+        return None
 
     def _status_playing(self):
         text = self.do_format(self.fmt_playing)
+        self.text_length = len(text)
+        progress = self._progress_index(self.elapsed(), len(text))
 
-        if (self.do_color_progress and self.status and self.status.get(
-                'time', None)):
-            elapsed, total = self.status['time'].split(':')
-            percent = float(elapsed) / float(total)
-            progress = int(percent * len(text))
+        if progress is not None:
 
             is_pause = self.status['state'] == 'pause'
 
@@ -294,59 +437,116 @@ class Mpd(base.ThreadPoolText):
             return pangocffi.markup_escape_text(text)
 
     def _get_status(self):
-        try:
-            self.status = self.client.status()
-            self.song = self.client.currentsong()
-        except Exception:
-            logger.exception('Mpd error on update')
-            return self.msg_nc
-
         if self.status['state'] == 'stop':
             return self.do_format(self.fmt_stopped)
         else:
             return self._status_playing()
 
-    def poll(self):
-        if not self.connect():
+    def refresh(self, status, song, elapsed=None):
+        """
+            Called in the event loop with a new snapshot from the session.
+            elapsed overrides the position in status, which is stale when
+            the snapshot was restored after a restart.
+        """
+        if self.stop:
             return
+        if song is not self.song:
+            # streams change their tags without changing the song id
+            self.song_cache = {}
+            self.song_serial += 1
+        self.status = status
+        self.song = song
+        if self.volume_timer is None:
+            self.volume = int(status.get('volume', -1))
+        self._sync_elapsed()
+        if elapsed is not None:
+            self.elapsed_base = elapsed
+        self.render()
+        self._schedule_progress()
+
+    def _render_key(self):
+        status = self.status
+        elapsed = self.elapsed()
+        return (
+            status.get('songid'),
+            self.song_serial,
+            status.get('state'),
+            status.get('volume'),
+            status.get('song'),
+            status.get('playlistlength'),
+            status.get('single'),
+            status.get('repeat'),
+            status.get('random'),
+            int(elapsed) if self.shows_elapsed else None,
+            self._progress_index(elapsed, self.text_length),
+            self.foreground,
+            self.foreground_progress,
+            self.pause_color,
+            self.pause_progress_color,
+        )
 
-        if self.first_poll:
-            self.first_poll = False
-            return self._get_status()
-
+    def render(self):
+        """
+            Rebuild the markup and redraw, unless nothing that shows up in
+            the text changed since the last render.
+        """
+        key = self._render_key()
+        if key == self.render_key:
+            self.redraws_skipped += 1
+            return
+        self.render_key = key
         try:
-            self.client.send_idle()
-            canRead = select.select([self.client], [], [], 5.0)[0]
-            if canRead:
-                self.client.fetch_idle()
-            else:
-                self.client.noidle()
-        except mpd.ConnectionError:
-            self.connected = False
-            return self.msg_nc
+            text = self._get_status()
         except Exception:
-            logger.exception('Error communicating with mpd')
-            return
+            logger.exception('Mpd error on update')
+            self.render_key = None
+            text = self.msg_nc
+        self.update(text)
+
+    def lost_connection(self):
+        self._cancel_progress()
+        self.status = {}
+        self.song = {}
+        self.song_cache = {}
+        self.render_key = None
+        self.update(self.msg_nc)
+
+    def info(self):
+        info = super(Mpd, self).info()
+        info['redraws_skipped'] = self.redraws_skipped
+        if self.session is not None:
+            stats = dict(self.session.stats)
+            refreshes = stats['refreshes'] or 1
+            stats['round_trips_per_refresh'] = stats['round_trips'] / refreshes
+            stats['fetch_ms_per_refresh'] = (stats['fetch_seconds'] * 1000 /
+                                             refreshes)
+            info['session'] = stats
+        return info
 
+    def poll(self):
+        if not self.status:
+            return self.msg_nc
         return self._get_status()
 
+    def _flush_volume(self):
+        self.volume_timer = None
+        if self.volume < 0 or not self.volume_pending:
+            self.volume_pending = 0
+            return
+        self.volume = max(0, min(self.volume + self.volume_pending, 100))
+        self.volume_pending = 0
+        self.command('setvol', self.volume)
+
     def button_press(self, x, y, button):
-        client = mpd.MPDClient()
-        try:
-            client.connect(host=self.host, port=self.port)
-            status = client.status()
-            if button == 3:
-                if status['state'] == 'pause':
-                    client.play()
-                else:
-                    client.pause()
-            elif button == 4:
-                client.setvol(min(int(status['volume']) + self.inc, 100))
-            elif button == 5:
-                client.setvol(max(int(status['volume']) - self.inc, 0))
-        except Exception:
-            logger.exception('Mpd error on click')
-        try:
-            client.disconnect()
-        except mpd.ConnectionError:
-            pass
+        if button == 3:
+            if self.status.get('state') == 'pause':
+                self.command('play')
+            else:
+                self.command('pause')
+        elif button in (4, 5):
+            # coalesce a burst of wheel events into a single setvol based
+            # on the volume last reported by the idle session
+            self.volume_pending += self.inc if button == 4 else -self.inc
+            if self.volume_timer is None:
+                self.volume_timer = self.timeout_add(
+                    self.volume_delay, self._flush_volume)
@@ -0,0 +1,310 @@
+# -*- coding: utf-8 -*-
+# depends on python-mpd
+
+import os
+import time
+import random
+import threading
+
+import mpd
+import select
+
+from libqtile.log_utils import logger
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(host, port, password, **config):
+    """
+        Return the shared session for an mpd server, so every widget
+        showing the same server uses one idle connection. The config of
+        the first widget is used to create the session.
+    """
+    key = (host, port, password)
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = _sessions[key] = MpdSession(host, port, password,
+                                                  **config)
+        return session
+
+
+class Backoff(object):
+    """
+        Exponential backoff with jitter for reconnects. After
+        max_failures attempts in a row it opens like a circuit breaker
+        and refuses further attempts until the cooldown has passed, then
+        lets a single attempt through again.
+    """
+    def __init__(self, base=1.0, cap=60.0, max_failures=5, cooldown=300.0):
+        self.base = base
+        self.cap = cap
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self.failures = 0
+        self.open_until = 0.0
+        self.delay = 0.0
+
+    def is_open(self):
+        return time.monotonic() < self.open_until
+
+    def wait_time(self):
+        """Seconds until the next attempt should be made"""
+        if self.is_open():
+            return self.open_until - time.monotonic()
+        return self.delay
+
+    def success(self):
+        self.failures = 0
+        self.open_until = 0.0
+
+    def failure(self):
+        """Record a failed attempt, return seconds to wait before the next"""
+        self.failures += 1
+        if self.failures >= self.max_failures:
+            self.open_until = time.monotonic() + self.cooldown
+            self.delay = self.cooldown
+        else:
+            delay = min(self.cap, self.base * 2 ** (self.failures - 1))
+            self.delay = random.uniform(delay / 2, delay)
+        return self.delay
+
+
+def _open(client, host, port, password, timeout):
+    client.timeout = timeout
+    client.connect(host=host, port=port)
+
+    if password:
+        try:
+            client.password(password)
+        except Exception:
+            logger.warning('Authentication failed.  Disconnecting')
+            raise
+
+
+class MpdSession(threading.Thread):
+    """
+        Keeps one connection in mpd's `idle` state and fans every new
+        status/song snapshot out to the subscribed widgets. Between events
+        the thread sleeps in select() without a timeout. A second
+        connection is kept for commands, so clicks never have to interrupt
+        the idle one.
+    """
+    subsystems = ('player', 'mixer', 'options', 'playlist')
+
+    def __init__(self, host, port, password, connect_timeout=2.0,
+                 max_failures=5, reconnect_cooldown=300.0):
+        super(MpdSession, self).__init__(name='mpd-idle %s:%s' % (host, port))
+        self.daemon = True
+        self.host = host
+        self.port = port
+        self.password = password
+        self.connect_timeout = connect_timeout
+        self.backoff = Backoff(max_failures=max_failures,
+                               cooldown=reconnect_cooldown)
+        self.client = mpd.MPDClient()
+        self.connected = False
+        self.command_client = mpd.MPDClient()
+        self.command_connected = False
+        self.command_lock = threading.Lock()
+        self.subscribers = []
+        self.lock = threading.Lock()
+        self.stopped = False
+        self.status = {}
+        self.song = {}
+        # round-trips and time spent fetching, see _refresh()
+        self.stats = dict(refreshes=0, round_trips=0, songs_fetched=0,
+                          songs_reused=0, fetch_seconds=0.0)
+        self._wake_r, self._wake_w = os.pipe()
+
+    def subscribe(self, widget):
+        with self.lock:
+            self.subscribers.append(widget)
+            status, song = self.status, self.song
+        if not self.is_alive():
+            self.start()
+        elif status:
+            widget.qtile.call_soon_threadsafe(widget.refresh, status, song)
+
+    def unsubscribe(self, widget):
+        with self.lock:
+            if widget in self.subscribers:
+                self.subscribers.remove(widget)
+            if self.subscribers:
+                return
+        with _sessions_lock:
+            if _sessions.get((self.host, self.port, self.password)) is self:
+                del _sessions[(self.host, self.port, self.password)]
+        self.stop()
+
+    def _publish(self, method, *args):
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for widget in subscribers:
+            widget.qtile.call_soon_threadsafe(getattr(widget, method), *args)
+
+    def stop(self):
+        self.stopped = True
+        try:
+            os.write(self._wake_w, b'x')
+        except OSError:
+            pass
+        with self.command_lock:
+            self._close_command()
+
+    def _wait(self, timeout=None):
+        """Sleep until timeout or stop(), return True if stopped"""
+        select.select([self._wake_r], [], [], timeout)
+        return self.stopped
+
+    def _connect(self, client):
+        """
+            Connect a client with a timeout and record the outcome in the
+            shared backoff. Only the first failure of a streak is logged.
+        """
+        if self.backoff.is_open():
+            return False
+        try:
+            _open(client, self.host, self.port, self.password,
+                  self.connect_timeout)
+        except Exception as e:
+            try:
+                client.disconnect()
+            except Exception:
+                pass
+            delay = self.backoff.failure()
+            if self.backoff.failures == 1:
+                logger.warning('Failed to connect to mpd at %s:%s: %s',
+                               self.host, self.port, e)
+            if self.backoff.is_open():
+                logger.warning('mpd at %s:%s unreachable, retrying in %ds',
+                               self.host, self.port, delay)
+            return False
+        self.backoff.success()
+        return True
+
+    def connect(self):
+        if not self.connected:
+            self.connected = self._connect(self.client)
+        return self.connected
+
+    def _idle(self):
+        self.client.send_idle(*self.subsystems)
+        readable = select.select([self.client, self._wake_r], [], [])[0]
+        if self._wake_r in readable:
+            return None
+        return self.client.fetch_idle()
+
+    def _fetch(self, changed):
+        """
+            Fetch the status and the current song in as few round-trips
+            as possible. Player events can also mean new tags of a stream
+            under the same song id, so the song is always fetched with
+            them, in the same command list as the status. Mixer, options
+            and playlist events only fetch the song if the id changed.
+        """
+        client = self.client
+        stats = self.stats
+        if changed is None or 'player' in changed:
+            client.command_list_ok_begin()
+            client.status()
+            client.currentsong()
+            status, song = client.command_list_end()
+            stats['round_trips'] += 1
+            stats['songs_fetched'] += 1
+            return status, song
+        status = client.status()
+        stats['round_trips'] += 1
+        if status.get('songid') == self.status.get('songid'):
+            return status, self.song
+        stats['round_trips'] += 1
+        stats['songs_fetched'] += 1
+        return status, client.currentsong()
+
+    def _refresh(self, changed):
+        start = time.monotonic()
+        status, song = self._fetch(changed)
+        self.stats['fetch_seconds'] += time.monotonic() - start
+        self.stats['refreshes'] += 1
+        if song is not self.song and song == self.song:
+            # a pause or a seek, keep the object so widgets keep the
+            # formatted tags
+            song = self.song
+            self.stats['songs_reused'] += 1
+        with self.lock:
+            self.status, self.song = status, song
+        self._publish('refresh', status, song)
+
+    def _disconnect(self):
+        if not self.connected:
+            return
+        self.connected = False
+        try:
+            self.client.disconnect()
+        except Exception:
+            pass
+
+    def _disconnected(self):
+        self._disconnect()
+        with self.lock:
+            self.status, self.song = {}, {}
+        self._publish('lost_connection')
+
+    def run(self):
+        while not self.stopped:
+            if not self.connect():
+                # one backoff for all subscribers of this server
+                if self._wait(self.backoff.wait_time()):
+                    break
+                continue
+            try:
+                changed = None
+                while not self.stopped:
+                    self._refresh(changed)
+                    changed = self._idle()
+                    if changed is None:
+                        break
+            except Exception as e:
+                if not isinstance(e, mpd.ConnectionError):
+                    logger.exception('Error communicating with mpd')
+                self._disconnected()
+                # don't spin if mpd accepts connections but drops them
+                if self._wait(self.backoff.failure()):
+                    break
+        self._disconnect()
+        os.close(self._wake_r)
+        os.close(self._wake_w)
+
+    def _close_command(self):
+        if self.command_connected:
+            self.command_connected = False
+            try:
+                self.command_client.disconnect()
+            except Exception:
+                pass
+
+    def command(self, name, *args):
+        """
+            Send one command over the persistent command connection,
+            (re)connecting lazily. Blocks, call it from the thread pool.
+        """
+        with self.command_lock:
+            for attempt in range(2):
+                if self.stopped:
+                    return
+                if not self.command_connected:
+                    # fails fast while the circuit breaker is open
+                    self.command_connected = self._connect(
+                        self.command_client)
+                    if not self.command_connected:
+                        return
+                try:
+                    return getattr(self.command_client, name)(*args)
+                except mpd.ConnectionError:
+                    # the server closed the idle command connection
+                    self._close_command()
+                except Exception:
+                    logger.exception('Mpd error on %s', name)
+                    return
@@ -2,6 +2,11 @@ import time
 import os
 
 from libqtile.widget import base
+from libqtile.log_utils import logger
+
+from .inotify import watcher
+from .snapshot import snapshot
+from .timerfd import wall_clock
 
 
 class Mtime(base.InLoopPollText):
@@ -19,19 +24,119 @@ class Mtime(base.InLoopPollText):
          "Text to show if file is newer then threshold"),
         ("text_file_not_found",
          "File not found",
-         "Text if file is not found")
+         "Text if file is not found"),
+        ("use_inotify",
+         True,
+         "Watch the file with inotify instead of polling it"),
     ]
 
+    # wall clock, to compare with file mtimes
+    clock = staticmethod(time.time)
+    # calls a function once that clock reaches a deadline, even after a
+    # suspend. All widgets share one timerfd.
+    timer = staticmethod(wall_clock.call_at)
+
     def __init__(self, **config):
         base.InLoopPollText.__init__(self, **config)
         self.add_defaults(self.defaults)
+        self.watching = False
+        self.mtime = None
+        self.threshold_timer = None
 
-    def poll(self):
+    def timer_setup(self):
+        state = snapshot.restore('mtime ' + self.file)
+        if self.use_inotify and self._watch(stat=state is None):
+            if state is not None:
+                self.mtime = state['mtime']
+                # the file may have changed while qtile restarted
+                self.qtile.call_soon(self._changed)
+            self.tick()
+        else:
+            base.InLoopPollText.timer_setup(self)
+
+    def finalize(self):
+        self._cancel_threshold()
+        if self.watching:
+            snapshot.save('mtime ' + self.file, {'mtime': self.mtime})
+            watcher.unsubscribe(self.directory, self.filename, self._changed)
+            self.watching = False
+        base.InLoopPollText.finalize(self)
+
+    def _watch(self, stat=True):
+        """
+            Watch the parent directory, so atomic replaces, creation and
+            removal of the file are noticed as well as writes to it.
+        """
+        path = os.path.abspath(self.file)
+        self.directory, self.filename = os.path.split(path)
         try:
-            mtime = os.path.getmtime(self.file)
+            watcher.subscribe(self.qtile, self.directory, self.filename,
+                              self._changed)
+        except OSError as e:
+            logger.warning('Cannot watch %s, falling back to polling: %s',
+                           self.directory, e)
+            return False
+        self.watching = True
+        if stat:
+            self._stat()
+        return True
+
+    def _stat(self):
+        try:
+            self.mtime = os.path.getmtime(self.file)
         except FileNotFoundError:
+            self.mtime = None
+
+    def _changed(self):
+        mtime = self.mtime
+        self._stat()
+        if self.mtime != mtime:
+            self.tick()
+
+    def _cancel_threshold(self):
+        if self.threshold_timer is not None:
+            self.threshold_timer.cancel()
+            self.threshold_timer = None
+
+    def _call_at(self, deadline, callback):
+        try:
+            return self.timer(self.qtile._eventloop, deadline, callback)
+        except OSError as e:
+            logger.warning('Cannot create a timerfd, the threshold of %s is '
+                           'checked late after a suspend: %s', self.file, e)
+            return self.timeout_add(deadline - self.clock(), callback)
+
+    def _threshold_reached(self):
+        self.threshold_timer = None
+        self.tick()
+
+    def remaining(self):
+        """Seconds until the file gets older than the threshold"""
+        return self.mtime + self.time_threshold - self.clock()
+
+    def _next_check(self, remaining):
+        return min(remaining, self.update_interval) + 0.01
+
+    def tick(self):
+        self.update(self.poll())
+        # when polling, check again no later than the next transition
+        if self.mtime is not None and not self.watching:
+            remaining = self.remaining()
+            if remaining >= 0:
+                return self._next_check(remaining)
+
+    def poll(self):
+        if not self.watching:
+            self._stat()
+        self._cancel_threshold()
+        if self.mtime is None:
             return self.text_file_not_found
-        now = time.mktime(time.localtime())
-        if max(now - mtime, 0) > self.time_threshold:
+        remaining = self.remaining()
+        if remaining < 0:
             return self.text_older_threshold
+        if self.watching:
+            # the text can only change when the mtime does, which re-arms
+            # this, or when the wall clock crosses the threshold
+            self.threshold_timer = self._call_at(
+                self.mtime + self.time_threshold, self._threshold_reached)
         return self.text_younger_threshold
@@ -0,0 +1,173 @@
+import os
+import time
+
+from libqtile.log_utils import logger
+
+_sampler = None
+
+
+def get_sampler(qtile, interval=1.0):
+    """The process wide sampler, created with the interval of its first user"""
+    global _sampler
+    if _sampler is None:
+        _sampler = ProcSampler(qtile, interval)
+    return _sampler
+
+
+class ProcFile(object):
+    """
+        A /proc file that is opened once and re-read from offset 0 with
+        pread, which makes the kernel regenerate its contents.
+    """
+    def __init__(self, path, size=4096):
+        self.path = path
+        self.size = size
+        self.fd = os.open(path, os.O_RDONLY | os.O_CLOEXEC)
+
+    def read(self):
+        data = os.pread(self.fd, self.size, 0)
+        while len(data) == self.size:
+            # grow the buffer until the whole file fits
+            self.size *= 2
+            data = os.pread(self.fd, self.size, 0)
+        return data
+
+    def close(self):
+        os.close(self.fd)
+
+
+def parse_stat(data):
+    """
+        Return {'cpu': (busy, total), 'cpu0': ...} jiffies from /proc/stat,
+        the cpu lines come first so the rest of the file is skipped.
+    """
+    cpus = {}
+    for line in data.split(b'\n'):
+        if not line.startswith(b'cpu'):
+            break
+        fields = line.split()
+        values = [int(v) for v in fields[1:9]]
+        # idle and iowait count as not busy
+        idle = values[3] + values[4]
+        total = sum(values)
+        cpus[fields[0].decode()] = (total - idle, total)
+    return cpus
+
+
+def parse_meminfo(data):
+    """Return /proc/meminfo as {'MemTotal': kB, ...}"""
+    info = {}
+    for line in data.split(b'\n'):
+        fields = line.split()
+        if len(fields) >= 2:
+            info[fields[0][:-1].decode()] = int(fields[1])
+    return info
+
+
+def parse_net_dev(data):
+    """Return {interface: (rx_bytes, tx_bytes)} from /proc/net/dev"""
+    interfaces = {}
+    # skip the two header lines
+    for line in data.split(b'\n')[2:]:
+        name, _, counters = line.partition(b':')
+        fields = counters.split()
+        if len(fields) >= 9:
+            interfaces[name.strip().decode()] = (int(fields[0]),
+                                                 int(fields[8]))
+    return interfaces
+
+
+class ProcSampler(object):
+    """
+        Reads /proc/stat, /proc/meminfo and /proc/net/dev once per tick
+        for all subscribed widgets. Only the files some subscriber asked
+        for are read. After each tick the widgets get the new values via
+        their sample() method:
+
+        - cpu: {'cpu': percent, 'cpu0': percent, ...} busy since last tick
+        - memory: {'MemTotal': kB, ...}
+        - net: {interface: (rx_bytes, tx_bytes)} per second since last tick
+    """
+    paths = {
+        'cpu': '/proc/stat',
+        'memory': '/proc/meminfo',
+        'net': '/proc/net/dev',
+    }
+    parsers = {
+        'cpu': parse_stat,
+        'memory': parse_meminfo,
+        'net': parse_net_dev,
+    }
+
+    def __init__(self, qtile, interval=1.0):
+        self.qtile = qtile
+        self.interval = interval
+        self.files = {}
+        self.subscribers = {}
+        self.raw = {}
+        self.values = {}
+        self.sampled_at = None
+        self.timer = None
+
+    def subscribe(self, widget, source):
+        if source not in self.files:
+            f = self.files[source] = ProcFile(self.paths[source])
+            self.subscribers[source] = []
+            # counters need a previous sample to compute the first rate
+            self.raw[source] = self.parsers[source](f.read())
+        self.subscribers[source].append(widget)
+        if self.timer is None:
+            self.timer = self.qtile.call_later(self.interval, self.sample)
+
+    def unsubscribe(self, widget, source):
+        subscribers = self.subscribers.get(source, [])
+        if widget in subscribers:
+            subscribers.remove(widget)
+        if not subscribers and source in self.files:
+            self.files.pop(source).close()
+            self.subscribers.pop(source)
+            self.raw.pop(source, None)
+        if not self.files and self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+    def _rates(self, source, raw, elapsed):
+        old = self.raw.get(source, raw)
+        if source == 'cpu':
+            values = {}
+            for cpu, (busy, total) in raw.items():
+                old_busy, old_total = old.get(cpu, (0, 0))
+                if total > old_total:
+                    values[cpu] = (100.0 * (busy - old_busy) /
+                                   (total - old_total))
+                else:
+                    values[cpu] = 0.0
+            return values
+        if source == 'net':
+            values = {}
+            for name, (rx, tx) in raw.items():
+                old_rx, old_tx = old.get(name, (rx, tx))
+                values[name] = (max(rx - old_rx, 0) / elapsed,
+                                max(tx - old_tx, 0) / elapsed)
+            return values
+        return raw
+
+    def sample(self):
+        now = time.monotonic()
+        elapsed = now - self.sampled_at if self.sampled_at else self.interval
+        self.sampled_at = now
+        for source, f in self.files.items():
+            try:
+                raw = self.parsers[source](f.read())
+            except Exception:
+                logger.exception('Failed to read %s', f.path)
+                continue
+            values = self._rates(source, raw, elapsed or self.interval)
+            self.raw[source] = raw
+            self.values[source] = values
+            for widget in list(self.subscribers[source]):
+                try:
+                    widget.sample(values)
+                except Exception:
+                    logger.exception('Failed to update %s', widget.name)
+        self.timer = self.qtile.call_later(self.interval, self.sample)
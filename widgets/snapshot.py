@@ -0,0 +1,77 @@
+import os
+import json
+import time
+import tempfile
+
+from libqtile.log_utils import logger
+
+SNAPSHOT = os.path.join(os.environ.get('XDG_RUNTIME_DIR') or
+                        tempfile.gettempdir(),
+                        'qtile-widgets-%d.json' % os.getuid())
+
+
+class Snapshot(object):
+    """
+        Keeps widget state across lazy.restart(). Widgets save() their
+        state when they are finalized and restore() it when they are set
+        up again, so the first frame after a restart shows what was shown
+        before instead of waiting for mpd, sysfs or new samples.
+
+        Only a snapshot written by this process (qtile restarts by
+        exec'ing itself, so the pid stays the same) and younger than
+        max_age seconds is restored, anything else is a previous session.
+    """
+    def __init__(self, path=SNAPSHOT, max_age=30):
+        self.path = path
+        self.max_age = max_age
+        self.restored = None
+        self.saved = {}
+
+    def _load(self):
+        self.restored = {}
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            os.unlink(self.path)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning('Cannot read widget snapshot %s: %s', self.path, e)
+            return
+        if (data.get('pid') == os.getpid() and
+                0 <= time.time() - data.get('time', 0) <= self.max_age):
+            self.restored = data.get('state', {})
+
+    def restore(self, key):
+        """Return the state saved under key before the restart, or None"""
+        if self.restored is None:
+            self._load()
+        return self.restored.pop(key, None)
+
+    def save(self, key, state):
+        """
+            Store state, which has to be serializable as JSON, under key.
+            The file is replaced atomically on every call, the widgets are
+            finalized one by one and any of them may be the last.
+        """
+        self.saved[key] = state
+        data = {'pid': os.getpid(), 'time': time.time(), 'state': self.saved}
+        directory, name = os.path.split(self.path)
+        try:
+            fd, tmp = tempfile.mkstemp(prefix=name, dir=directory)
+        except OSError as e:
+            logger.warning('Cannot write widget snapshot %s: %s',
+                           self.path, e)
+            return
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(tmp, self.path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning('Cannot write widget snapshot %s: %s',
+                           self.path, e)
+            del self.saved[key]
+            os.unlink(tmp)
+
+
+snapshot = Snapshot()
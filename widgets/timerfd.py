@@ -0,0 +1,136 @@
+import os
+import time
+import errno
+import heapq
+import ctypes
+import itertools
+
+from libqtile.log_utils import logger
+
+from .inotify import _load_libc, _check
+
+CLOCK_REALTIME = 0
+
+TFD_CLOEXEC = os.O_CLOEXEC
+TFD_NONBLOCK = os.O_NONBLOCK
+
+TFD_TIMER_ABSTIME = 1
+TFD_TIMER_CANCEL_ON_SET = 2
+
+
+class itimerspec(ctypes.Structure):
+    _fields_ = [
+        ('interval_sec', ctypes.c_long),
+        ('interval_nsec', ctypes.c_long),
+        ('value_sec', ctypes.c_long),
+        ('value_nsec', ctypes.c_long),
+    ]
+
+
+class Timer(object):
+    """A deadline registered with a WallClock"""
+    def __init__(self, clock, entry, callback):
+        self.clock = clock
+        self.entry = entry
+        self.callback = callback
+
+    @property
+    def deadline(self):
+        return self.entry[0]
+
+    def cancel(self):
+        self.clock._cancel(self)
+
+
+class WallClock(object):
+    """
+        Process wide registry of wall clock deadlines. The event loop's
+        own timers sleep on the monotonic clock, which stops while the
+        machine is suspended. All deadlines here share a single
+        CLOCK_REALTIME timerfd, armed with TFD_TIMER_ABSTIME at the
+        earliest one, so it fires right after a resume that is past it
+        and is re-armed when the clock is set. The fd is only open while
+        there are deadlines.
+    """
+    def __init__(self):
+        self.libc = None
+        self.loop = None
+        self.fd = -1
+        self.armed = None
+        self.timers = []
+        self.order = itertools.count()
+
+    def call_at(self, loop, deadline, callback):
+        """
+            Call callback() in the event loop once the wall clock reaches
+            deadline, in seconds since the epoch. Returns a Timer to
+            cancel() it. Raises OSError if the timerfd can't be created.
+        """
+        if self.fd < 0:
+            self.libc = _load_libc()
+            self.fd = _check(self.libc.timerfd_create(
+                CLOCK_REALTIME, TFD_NONBLOCK | TFD_CLOEXEC))
+            self.loop = loop
+            self.loop.add_reader(self.fd, self._on_expired)
+        timer = Timer(self, [deadline, next(self.order), None], callback)
+        timer.entry[2] = timer
+        heapq.heappush(self.timers, timer.entry)
+        self._arm()
+        return timer
+
+    def _cancel(self, timer):
+        if timer.entry in self.timers:
+            self.timers.remove(timer.entry)
+            heapq.heapify(self.timers)
+            self._arm()
+
+    def _arm(self):
+        if not self.timers:
+            self._close()
+            return
+        deadline = self.timers[0][0]
+        if deadline == self.armed:
+            return
+        seconds = int(deadline)
+        # round up, so the timer never fires before the deadline
+        nanoseconds = min(int((deadline - seconds) * 1e9) + 1, 999999999)
+        spec = itimerspec(0, 0, seconds, nanoseconds)
+        _check(self.libc.timerfd_settime(
+            self.fd, TFD_TIMER_ABSTIME | TFD_TIMER_CANCEL_ON_SET,
+            ctypes.byref(spec), None))
+        self.armed = deadline
+
+    def _close(self):
+        if self.fd >= 0:
+            self.loop.remove_reader(self.fd)
+            os.close(self.fd)
+            self.fd = -1
+        self.armed = None
+
+    def _on_expired(self):
+        try:
+            os.read(self.fd, 8)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            if e.errno != errno.ECANCELED:
+                raise
+            # the clock was set: run what is due on the new time and arm
+            # the timerfd again
+        self.armed = None
+        now = time.time()
+        due = []
+        while self.timers and self.timers[0][0] <= now:
+            due.append(heapq.heappop(self.timers)[2])
+        self._arm()
+        for timer in due:
+            try:
+                timer.callback()
+            except Exception:
+                logger.exception('Error in timer callback')
+
+    def fileno(self):
+        return self.fd
+
+
+wall_clock = WallClock()
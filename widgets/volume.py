@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+# depends on pulsectl
+
+import os
+import select
+import functools
+import threading
+
+import pulsectl
+
+from libqtile import bar
+from libqtile.widget import base
+from libqtile.log_utils import logger
+
+
+class PulseMixer(object):
+    """
+        Controls the volume of pulseaudio's default sink over one
+        persistent connection, owned by a thread that otherwise sleeps in
+        pulseaudio's event loop. Key presses only add to a pending change
+        and wake the thread, so a held key results in as many volume
+        changes as pulseaudio can take instead of one process per repeat.
+
+        Subscribed widgets get update(volume, muted) in qtile's event loop
+        whenever the sink changes, whoever changed it.
+
+        The thread is woken through a pipe that is polled together with
+        pulseaudio's fds, so a key press that comes in while the thread
+        is about to sleep is not lost.
+    """
+    # seconds to wait before reconnecting to pulseaudio
+    reconnect_delay = 5
+
+    def __init__(self, client_name='qtile'):
+        self.client_name = client_name
+        self.qtile = None
+        self.thread = None
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.toggle = False
+        self.unmute = False
+        self.stopped = False
+        self.wakeup = os.pipe2(os.O_NONBLOCK | os.O_CLOEXEC)
+        self.subscribers = []
+        self.volume = None
+        self.muted = None
+
+    def start(self, qtile):
+        if self.thread is not None:
+            return
+        self.qtile = qtile
+        self.thread = threading.Thread(target=self.run, name='pulse')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.stopped = True
+        self._wake()
+
+    def subscribe(self, widget):
+        self.subscribers.append(widget)
+        self.start(widget.qtile)
+        if self.volume is not None:
+            widget.update(self.volume, self.muted)
+
+    def unsubscribe(self, widget):
+        if widget in self.subscribers:
+            self.subscribers.remove(widget)
+
+    def _wake(self):
+        try:
+            os.write(self.wakeup[1], b'\0')
+        except BlockingIOError:
+            # the pipe is full, the thread will wake up anyway
+            pass
+
+    def _poll(self, pulse, fds, timeout):
+        """
+            Poll function for pulseaudio's main loop, which also stops
+            event_listen() once _wake() wrote to the wakeup pipe.
+        """
+        poller = select.poll()
+        for pollfd in fds:
+            poller.register(pollfd.fd, pollfd.events)
+        poller.register(self.wakeup[0], select.POLLIN)
+        # pulseaudio passes -1 ms for no timeout
+        ready = dict(poller.poll(None if timeout < 0 else timeout * 1000))
+        if ready.pop(self.wakeup[0], 0):
+            try:
+                while os.read(self.wakeup[0], 4096):
+                    pass
+            except BlockingIOError:
+                pass
+            pulse.event_listen_stop()
+        for pollfd in fds:
+            pollfd.revents = ready.get(pollfd.fd, 0)
+        return len(ready)
+
+    def _poll_error(self, *exc_info):
+        logger.error('Error polling pulseaudio', exc_info=exc_info)
+
+    def change(self, qtile, delta):
+        """Change the volume by delta percent and unmute"""
+        with self.lock:
+            self.pending += delta
+            self.unmute = True
+        self.start(qtile)
+        self._wake()
+
+    def raise_volume(self, qtile, step=5):
+        self.change(qtile, step)
+
+    def lower_volume(self, qtile, step=5):
+        self.change(qtile, -step)
+
+    def toggle_mute(self, qtile):
+        with self.lock:
+            self.toggle = not self.toggle
+        self.start(qtile)
+        self._wake()
+
+    def _on_event(self, event):
+        # leave event_listen() to handle the change in run()
+        raise pulsectl.PulseLoopStop
+
+    def _apply(self, pulse):
+        with self.lock:
+            pending, self.pending = self.pending, 0
+            toggle, self.toggle = self.toggle, False
+            unmute, self.unmute = self.unmute, False
+        sink = pulse.get_sink_by_name(pulse.server_info().default_sink_name)
+        if pending:
+            volume = min(max(sink.volume.value_flat + pending / 100.0, 0), 1)
+            pulse.volume_set_all_chans(sink, volume)
+        if toggle:
+            pulse.mute(sink, not sink.mute)
+        elif unmute and sink.mute:
+            pulse.mute(sink, False)
+        if pending or toggle or unmute:
+            sink = pulse.get_sink_by_name(sink.name)
+        self._publish(round(sink.volume.value_flat * 100), bool(sink.mute))
+
+    def _publish(self, volume, muted):
+        if (volume, muted) == (self.volume, self.muted):
+            return
+        self.volume, self.muted = volume, muted
+        for widget in list(self.subscribers):
+            self.qtile.call_soon_threadsafe(widget.update, volume, muted)
+
+    def run(self):
+        while not self.stopped:
+            try:
+                with pulsectl.Pulse(self.client_name) as pulse:
+                    pulse.event_mask_set('sink', 'server')
+                    pulse.event_callback_set(self._on_event)
+                    pulse.set_poll_func(functools.partial(self._poll, pulse),
+                                        self._poll_error)
+                    while not self.stopped:
+                        self._apply(pulse)
+                        with self.lock:
+                            busy = self.pending or self.toggle
+                        if not busy:
+                            pulse.event_listen()
+            except (pulsectl.PulseError, pulsectl.PulseDisconnected) as e:
+                logger.warning('Lost connection to pulseaudio: %r', e)
+            except Exception:
+                logger.exception('Error in the pulseaudio thread')
+            if not self.stopped:
+                # pulseaudio restarts with the session, don't spin meanwhile
+                threading.Event().wait(self.reconnect_delay)
+
+
+mixer = PulseMixer()
+
+
+class Volume(base._TextBox):
+    """
+        Volume of pulseaudio's default sink, updated on change events.
+        Scroll to change the volume, click to toggle mute.
+    """
+    orientations = base.ORIENTATION_HORIZONTAL
+    defaults = [
+        ("fmt", "♪ {}%", "Format of the volume"),
+        ("mute_text", "♪ mute", "Text when muted"),
+        ("step", 2, "Volume step in percent for scrolling"),
+    ]
+
+    def __init__(self, **config):
+        base._TextBox.__init__(self, "♪", width=bar.CALCULATED, **config)
+        self.add_defaults(Volume.defaults)
+
+    def timer_setup(self):
+        mixer.subscribe(self)
+
+    def finalize(self):
+        mixer.unsubscribe(self)
+        base._TextBox.finalize(self)
+
+    def update(self, volume, muted):
+        text = self.mute_text if muted else self.fmt.format(volume)
+        if text != self.text:
+            self.text = text
+            self.bar.draw()
+
+    def button_press(self, x, y, button):
+        if button == 1:
+            mixer.toggle_mute(self.qtile)
+        elif button == 4:
+            mixer.raise_volume(self.qtile, self.step)
+        elif button == 5:
+            mixer.lower_volume(self.qtile, self.step)